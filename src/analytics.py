@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import json
+import numpy as np
+import os
 import pandas as pd
+import storage
 
 pd.set_option('display.max_columns', None)  # pd.set_option('display.max_rows', None)
 pd.set_option('display.width', 250)
@@ -10,7 +14,175 @@ pd.set_option('display.width', 250)
 Script containing methods to perform analytics on YouTube videos retrieved with youtube.py / main.py
 """
 
+"GLOBAL"
+
+METRICS = ['views', 'likes', 'comments']
+AGGREGATES_PATH = '../data/channel_aggregates.csv'
+
+"FUNCTIONS"
+
+
+def channel_categories(pocket_tube: dict):
+    """Map each YouTube channel to its PocketTube category (first category found if a channel has several)
+    :param pocket_tube: PocketTube database as dictionary
+    :return: pd.Series indexed by channel ID with category names.
+    """
+    pairs = [(channel_id, category) for category, channels in pocket_tube.items() if 'ysc' not in category
+             for channel_id in channels]
+    mapping = pd.DataFrame(pairs, columns=['channel_id', 'category']).drop_duplicates('channel_id')
+    return mapping.set_index('channel_id').category
+
+
+def add_rates(stats: pd.DataFrame):
+    """Add like and comment rates (per view) for every horizon
+    :param stats: historical statistics (one row per video, wide format)
+    :return stats: statistics with 'like_rate_wX' and 'comment_rate_wX' columns.
+    """
+    for week in storage.HORIZONS:
+        views = stats[f'views_w{week}'].astype('float64').replace(0, np.nan)
+        stats[f'like_rate_w{week}'] = stats[f'likes_w{week}'].astype('float64') / views
+        stats[f'comment_rate_w{week}'] = stats[f'comments_w{week}'].astype('float64') / views
+
+    return stats
+
+
+def add_growth(stats: pd.DataFrame):
+    """Add view growth ratios and view velocities (views per day) between consecutive horizons
+    :param stats: historical statistics (one row per video, wide format)
+    :return stats: statistics with 'growth_wX_wY' and 'velocity_wX_wY' columns.
+    """
+    for start, end in zip(storage.HORIZONS[:-1], storage.HORIZONS[1:]):
+        v_start = stats[f'views_w{start}'].astype('float64')
+        v_end = stats[f'views_w{end}'].astype('float64')
+        stats[f'growth_w{start}_w{end}'] = v_end / v_start.replace(0, np.nan)
+        stats[f'velocity_w{start}_w{end}'] = (v_end - v_start) / ((end - start) * 7)
+
+    return stats
+
+
+def percentile_ranks(stats: pd.DataFrame, by: str = 'channel_id', metric: str = 'views_w1'):
+    """Percentile rank of each video within its group (channel or category) for a given metric
+    :param stats: historical statistics (one row per video, wide format)
+    :param by: grouping column ('channel_id' or 'category')
+    :param metric: column to rank on
+    :return: pd.Series of percentile ranks in [0, 1] aligned on stats index (NaN if metric is missing).
+    """
+    return stats.groupby(by, observed=True)[metric].rank(pct=True, method='average')
+
+
+def top_n(stats: pd.DataFrame, metric: str = 'views_w1', n: int = 10, by: str = None):
+    """Top-N videos on a given metric, overall or per group
+    :param stats: historical statistics (one row per video, wide format)
+    :param metric: column to sort on
+    :param n: number of videos to keep (per group if 'by' is set)
+    :param by: optional grouping column ('channel_id' or 'category')
+    :return: pd.DataFrame of the best videos.
+    """
+    ranked = stats.dropna(subset=[metric]).sort_values(metric, ascending=False)
+
+    if by is None:
+        return ranked.head(n)
+
+    return ranked.groupby(by, observed=True, sort=False).head(n)
+
+
+def channel_aggregates(stats: pd.DataFrame):
+    """Compute per-channel aggregates (counts, sums, medians, rates and growth) as group operations
+    :param stats: historical statistics (one row per video, wide format)
+    :return aggregates: pd.DataFrame indexed by channel ID.
+    """
+    stats = add_growth(stats.copy())
+    columns = [f'{metric}_w{week}' for metric in METRICS for week in storage.HORIZONS]
+    numeric = stats[columns].astype('float64')
+    numeric['channel_id'] = stats.channel_id.values
+    grouped = numeric.groupby('channel_id', observed=True)
+
+    sums = grouped.sum(min_count=1).add_prefix('sum_')
+    counts = grouped.count().add_prefix('n_')
+    medians = grouped[[f'views_w{week}' for week in storage.HORIZONS]].median().add_prefix('median_')
+    aggregates = pd.concat([stats.groupby('channel_id', observed=True).size().rename('n_videos'),
+                            counts, sums, medians], axis=1)
+
+    for week in storage.HORIZONS:  # Channel-level rates are ratios of sums (not means of ratios)
+        aggregates[f'like_rate_w{week}'] = aggregates[f'sum_likes_w{week}'] / aggregates[f'sum_views_w{week}']
+        aggregates[f'comment_rate_w{week}'] = aggregates[f'sum_comments_w{week}'] / aggregates[f'sum_views_w{week}']
+
+    growth_cols = [col for col in stats.columns if col.startswith(('growth_', 'velocity_'))]
+    growth = stats[growth_cols].astype('float64')
+    growth['channel_id'] = stats.channel_id.values
+    aggregates = aggregates.join(growth.groupby('channel_id', observed=True).median().add_prefix('median_'))
+    aggregates.index.name = 'channel_id'
+
+    return aggregates.replace([np.inf, -np.inf], np.nan)
+
+
+def affected_channels(stats: pd.DataFrame, aggregates: pd.DataFrame):
+    """Find channels whose aggregates are outdated: new channels, new videos or newly filled horizons
+    :param stats: historical statistics (one row per video, wide format)
+    :param aggregates: previously computed channel aggregates
+    :return: list of channel IDs to recompute.
+    """
+    count_cols = [f'views_w{week}' for week in storage.HORIZONS]
+    fresh = stats.groupby('channel_id', observed=True)[count_cols].count().add_prefix('n_')
+    fresh.insert(0, 'n_videos', stats.groupby('channel_id', observed=True).size())
+    stored = aggregates.reindex(index=fresh.index, columns=fresh.columns)
+    changed = (fresh != stored).any(axis=1)
+    return fresh.index[changed].tolist()
+
+
+def update_aggregates(stats: pd.DataFrame, aggregates: pd.DataFrame = None, channels: list = None):
+    """Incrementally update channel aggregates, recomputing affected channels only
+    :param stats: historical statistics (one row per video, wide format)
+    :param aggregates: previously computed channel aggregates (full computation if None or empty)
+    :param channels: channel IDs to recompute (detected with 'affected_channels' if None)
+    :return aggregates: updated channel aggregates.
+    """
+    if aggregates is None or aggregates.empty:
+        return channel_aggregates(stats)
+
+    if channels is None:
+        channels = affected_channels(stats, aggregates)
+
+    if not channels:
+        return aggregates
+
+    fresh = channel_aggregates(stats.loc[stats.channel_id.isin(channels)])
+    kept = aggregates.loc[~aggregates.index.isin(channels)]
+    return pd.concat([kept, fresh]).sort_index()
+
+
+def load_aggregates(path: str = AGGREGATES_PATH):
+    """Load stored channel aggregates
+    :param path: CSV file path
+    :return: pd.DataFrame indexed by channel ID (None if no file yet).
+    """
+    if not os.path.exists(path):
+        return None
+
+    return pd.read_csv(path, encoding='utf-8', index_col='channel_id')
+
+
+def save_aggregates(aggregates: pd.DataFrame, path: str = AGGREGATES_PATH):
+    """Store channel aggregates
+    :param aggregates: channel aggregates
+    :param path: CSV file path.
+    """
+    aggregates.to_csv(path, encoding='utf-8')
+
+
 "MAIN"
 
 if __name__ == "__main__":
-    print('Hello world :)')
+    with open('../data/pocket_tube.json', 'r', encoding='utf8') as pt_file:
+        categories = channel_categories(json.load(pt_file))
+
+    histo_data = storage.read_stats_history('../data/stats.csv')
+    histo_data['category'] = histo_data.channel_id.map(categories)
+
+    channel_agg = update_aggregates(histo_data, load_aggregates())
+    save_aggregates(channel_agg)
+
+    histo_data = add_rates(add_growth(histo_data))
+    histo_data['rank_in_channel'] = percentile_ranks(histo_data, by='channel_id')
+    histo_data['rank_in_category'] = percentile_ranks(histo_data, by='category')
+    print(top_n(histo_data, metric='views_w1', n=3, by='category'))
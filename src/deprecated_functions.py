@@ -1,15 +1,17 @@
 # -*- coding: utf-8 -*-
 
-import bs4
+import concurrent.futures
 import datetime as dt
 import googleapiclient.errors
 import itertools
-import json
 import pandas as pd
 import pyyoutube as pyt
 import random
+import re
 import requests
+import storage
 import tqdm
+import transport
 import tzlocal
 
 import youtube
@@ -48,56 +50,73 @@ def del_from_playlist(service: pyt.Client, playlist_id: str, items_list: list, p
             print(http_error)
 
 
-def find_livestreams(channel_id: str):
-    """Find livestreams on YouTube using a channel ID
+def find_livestreams(channel_id: str, chunk_size: int = 64 * 1024):
+    """Find livestreams on YouTube using a channel ID. The channel page is streamed and scanned at byte level
+    (no DOM, no JSON parsing), the download stops as soon as the first page section has been read
     :param channel_id: a YouTube channel ID
+    :param chunk_size: size of streamed chunks in bytes
     :return live_list: list of livestream ID (or empty list if no livestream at the moment).
     """
+    section_start = b'"sectionListRenderer":{"contents":[{"itemSectionRenderer":{"contents":[{'
+    featured = b'"channelFeaturedContentRenderer"'
+    video_id_regex = re.compile(rb'"videoRenderer":\{"videoId":"([\w-]{11})"')
+
     try:
         cookies = {'CONSENT': f'YES+cb.20210328-17-p0.en-GB+FX+{random.randint(100, 999)}'}  # Cookies settings
         url = f'https://www.youtube.com/channel/{channel_id}'
-        web_page = requests.get(url, cookies=cookies, timeout=(5, 5))  # Page request
-        soup = bs4.BeautifulSoup(web_page.text, 'html.parser')  # HTML parsing
 
-        # Filtering JS part only, then convert to string
-        js_scripts = [script for script in soup.find_all('script') if 'sectionListRenderer' in str(script)][0].text
-        sections_as_dict = json.loads(js_scripts.replace('var ytInitialData = ', '')[:-1])  # Parse JS as dictionary
+        with transport.WEB_SESSION.get(url, cookies=cookies, timeout=(5, 5), stream=True) as web_page:  # Streamed
+            buffer = b''
+
+            for chunk in web_page.iter_content(chunk_size=chunk_size):
+                buffer += chunk
+                start = buffer.find(section_start)
+
+                if start == -1:  # First section not reached yet, keep the tail only (marker may be split)
+                    buffer = buffer[-len(section_start):]
+                    continue
+
+                section = buffer[start + len(section_start):]
 
-        # Extract content from page tabs
-        tab = sections_as_dict['contents']['twoColumnBrowseResultsRenderer']['tabs'][0]['tabRenderer']['content']
+                if len(section) < len(featured):
+                    continue
 
-        # Extract content from channel page items
-        section = tab['sectionListRenderer']['contents'][0]['itemSectionRenderer']['contents'][0]
+                if not section.startswith(featured):  # First section is not a livestream shelf
+                    break
 
-        if 'channelFeaturedContentRenderer' in section.keys():  # If at least one livestream is running
-            # Extract each livestream item
-            featured = section['channelFeaturedContentRenderer']['items']
-            # Extract livestream IDs channel_id
-            livestream_ids = [{'channel_id': channel_id, 'video_id': item['videoRenderer']['videoId']} for item in
-                              featured]
-            return livestream_ids
+                end = section.find(b'"itemSectionRenderer"')  # Next section: the featured content is complete
 
-    except requests.exceptions.ConnectionError:
+                if end != -1:
+                    return [{'channel_id': channel_id, 'video_id': video_id.decode()}
+                            for video_id in video_id_regex.findall(section[:end])]
+
+    except requests.exceptions.RequestException:
         # history.warning('ConnectionError with this channel: %s', channel_id)
         pass
 
     return []  # Return if no livestream at the moment or in case of ConnectionError
 
 
-def iter_livestreams(channel_list: list, prog_bar: bool = True):
-    """Apply 'find_livestreams' for a collection of YouTube channel
+def iter_livestreams(channel_list: list, service: pyt.Client = None, max_workers: int = 16, prog_bar: bool = True):
+    """Find livestreams for a collection of YouTube channel, concurrently. Batched API requests are used if a
+    service is given ('youtube.find_livestreams'), streamed channel pages are scanned otherwise
     :param channel_list: list of YouTube channel IDs
+    :param service: a Python YouTube Client (optional)
+    :param max_workers: number of channels processed concurrently
     :param prog_bar: to use tqdm progress bar or not
     :return: IDs of current live based on channels collection.
     """
     all_channels = channel_list  # + ADD_ON['certified']
 
-    if prog_bar:
-        lives_it = [find_livestreams(chan_id) for chan_id in tqdm.tqdm(all_channels, desc='Looking for livestreams')]
-    else:
-        lives_it = [find_livestreams(chan_id) for chan_id in all_channels]
+    if service is not None:
+        return youtube.find_livestreams(service, all_channels, max_workers=max_workers, prog_bar=prog_bar)
 
-    return list(itertools.chain.from_iterable(lives_it))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        lives_it = executor.map(find_livestreams, all_channels)
+        if prog_bar:
+            lives_it = tqdm.tqdm(lives_it, total=len(all_channels), desc='Looking for livestreams')
+
+        return list(itertools.chain.from_iterable(lives_it))
 
 
 def sort_livestreams(service: pyt.Client, playlist_id: str, prog_bar: bool = True):
@@ -108,7 +127,6 @@ def sort_livestreams(service: pyt.Client, playlist_id: str, prog_bar: bool = Tru
     """
     livestreams = youtube.get_playlist_items(service=service, playlist_id=playlist_id)  # Retrieve livestreams
     livestreams_df = pd.DataFrame(livestreams).loc[:, ['video_id', 'item_id']]
-    livestreams_df['position'] = livestreams_df.index
 
     req = service.videos().list(part=['statistics', 'liveStreamingDetails'],  # Then statistics
                                 id=','.join(livestreams_df.video_id.tolist()),
@@ -119,33 +137,13 @@ def sort_livestreams(service: pyt.Client, playlist_id: str, prog_bar: bool = Tru
               'total_view': int(item['statistics'].get('viewCount', 0))} for item in req.get('items', [])]
 
     stats_df = pd.DataFrame(stats).sort_values(['viewers', 'total_view'], ascending=False, axis=0, ignore_index=True)
-    stats_df['new_position'] = stats_df.index
-
-    # Merge then sort by concurrent viewers
-    df_ordered = livestreams_df.merge(stats_df).sort_values(['viewers', 'total_view', 'new_position'],
-                                                            ascending=True, axis=0, ignore_index=True)
-
-    to_change = df_ordered.loc[df_ordered.position != df_ordered.new_position].to_dict('records')
-
-    if to_change:  # If an update is needed, change position in the playlist
-        if prog_bar:
-            change_iterator = tqdm.tqdm(to_change, desc=f'Moving livestreams in the playlist ({playlist_id})')
-
-        else:
-            change_iterator = to_change
-
-        for change in change_iterator:
-            r_body = {'id': change['item_id'],
-                      'snippet': {'playlistId': playlist_id,
-                                  'resourceId': {'kind': 'youtube#video', 'videoId': change['video_id']},
-                                  'position': change['new_position']}}
-            try:
-                service.playlistItems().update(part='snippet', body=r_body).execute()
 
-            except googleapiclient.errors.HttpError as http_error:  # skipcq: PYL-W0703
-                # history.warning('(%s) - %s', change['video_id'], http_error.error_details)
-                print(http_error)
+    # Move only the livestreams outside the longest already well-ordered sequence
+    n_moves = youtube.apply_order(service=service, playlist_id=playlist_id,
+                                  items_list=livestreams_df.to_dict('records'),
+                                  desired_ids=stats_df.video_id.tolist(), prog_bar=prog_bar)
 
+    if n_moves:
         # history.info('Livestreams playlist sorted.')
         print('Livestreams playlist sorted.')
 
@@ -219,11 +217,9 @@ def update_playlist(service: pyt.Client, playlist_id: str, videos_to_add: list,
             del_cond = (in_playlist.status == 'private') | (in_playlist.release_date < date_delta)  # Delete condition
             to_del = in_playlist.loc[del_cond]  # Keep public and newest videos.
 
-            if not to_del.empty:  # Save deleted videos as CSV
+            if not to_del.empty:  # Save deleted videos in the append-only history store
                 to_del_filter = to_del.loc[to_del.channel_id.notna()]
-                mix_history = pd.read_csv('../data/mix_history.csv', encoding='utf8', low_memory=False)
-                mix_history = pd.concat([mix_history, to_del_filter], ignore_index=True)
-                mix_history.to_csv('../data/mix_history.csv', encoding='utf8', index=False)
+                storage.append_rows('../data/mix_history', to_del_filter)
 
     to_add = pd.DataFrame(videos_to_add)
 
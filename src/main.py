@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 
+import concurrent.futures
+import datetime as dt
 import github
+import glob
+import hashlib
 import json
 import logging
+import multiprocessing
+import numpy as np
 import os
 import pandas as pd
+import pipeline
 import re
+import storage
 import sys
+import transport
+import video_index
 
 import youtube
 
@@ -25,6 +35,13 @@ except KeyError:
     github_repo = 'Dyl-M/auto_youtube_playlist'
     PAT = 'PAT'
 
+# Stages to skip or to run alone (comma-separated stage names, see 'build_stages')
+STAGES_SKIP = [name for name in os.environ.get('STAGES_SKIP', '').split(',') if name]
+STAGES_ONLY = [name for name in os.environ.get('STAGES_ONLY', '').split(',') if name]
+
+# Profiling mode: 'cprofile' or 'sample' (reports in '../log/profiles'), disabled if empty
+PROFILE = os.environ.get('PROFILE') or None
+
 "SYSTEM"
 
 try:
@@ -32,6 +49,14 @@ try:
 except IndexError:
     exe_mode = 'local'
 
+# Sharding mode: 'shard i/n' (scan one shard), 'merge n' (merge shards then route) or 'pool n' (local process pool)
+try:
+    shard_mode, shard_arg = sys.argv[2], sys.argv[3]
+except IndexError:
+    shard_mode, shard_arg = None, None
+
+SHARDS_DIR = '../data/shards'
+
 "PARAMETER FILES"
 
 # Open and read data files
@@ -57,8 +82,14 @@ watch_later = playlists['watch_later']['id']
 re_listening = playlists['re_listening']['id']
 legacy = playlists['legacy']['id']
 
-# Historical Data
-histo_data = pd.read_csv('../data/stats.csv', encoding='utf-8')
+# Historical Data (active set only, completed videos are archived)
+histo_data = storage.read_stats('../data/stats.csv')
+
+# Every video ever routed (seeded with the statistics history on first use)
+SEEN = video_index.SeenIndex()
+
+if not len(SEEN):
+    SEEN.add(storage.read_stats_history('../data/stats.csv')[storage.STATS_KEY].values)
 
 "FUNCTIONS"
 
@@ -76,6 +107,116 @@ def copy_last_exe_log():
         last_exe_file.write(last_exe_log)
 
 
+def shard_of(channel_id: str, n_shards: int):
+    """Stable shard number of a YouTube channel (same result across processes, runs and machines)
+    :param channel_id: YouTube channel ID
+    :param n_shards: number of shards
+    :return: shard number in [0, n_shards).
+    """
+    return int(hashlib.md5(channel_id.encode('utf-8')).hexdigest(), 16) % n_shards
+
+
+def scan(service, channels: list, prog_bar: bool = True, snapshot: bool = True):
+    """Search for new videos on a collection of YouTube channels, then add their statistics
+    :param service: a Python YouTube Client
+    :param channels: list of YouTube channel IDs
+    :param prog_bar: to use tqdm progress bar or not
+    :param snapshot: to record retrieved statistics in the snapshots store or not
+    :return: new videos with statistics as pd.DataFrame (empty if no new video).
+    """
+    new_videos = youtube.iter_channels(service, channels, prog_bar=prog_bar)
+
+    # Videos already routed (window overlap, rerun) are dropped before enrichment: each video is processed once
+    seen = SEEN.contains(video_index.pack_ids(video['video_id'] for video in new_videos))
+    new_videos = [video for video, is_seen in zip(new_videos, seen) if not is_seen]
+
+    if not new_videos:
+        return pd.DataFrame()
+
+    return youtube.add_stats(service=service, video_list=new_videos, snapshot=snapshot)
+
+
+def scan_shard(shard: int, n_shards: int, mode: str = exe_mode, service=None):
+    """Scan the channels of one shard and write the partial result, to be merged by 'merge_shards'
+    :param shard: shard number
+    :param n_shards: number of shards
+    :param mode: execution mode ('local' or workflow), used to create a service if none is given
+    :param service: a Python YouTube Client (created in the current process if None)
+    :return: number of new videos found in the shard.
+    """
+    if service is None:
+        service = youtube.create_service_local(log=False) if mode == 'local' else youtube.create_service_workflow()[0]
+
+    youtube.JOURNAL['active'] = False  # The checkpoint journal belongs to the main process, shards are re-run
+
+    channels = [channel_id for channel_id in all_channels if shard_of(channel_id, n_shards) == shard]
+    new_data = scan(service, channels, prog_bar=False, snapshot=False)  # Snapshots are appended once by the merge
+
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    storage.save_json({'channels': sorted(youtube.SCAN_FAILED['channels']), 'videos': youtube.SCAN_FAILED['videos'],
+                       'window_end': youtube.WINDOW_END.isoformat()},
+                      f'{SHARDS_DIR}/shard_{shard}_of_{n_shards}.json')  # Failures, before the results are complete
+    tmp_path = f'{SHARDS_DIR}/shard_{shard}_of_{n_shards}.csv.tmp'
+    new_data.to_csv(tmp_path, encoding='utf-8', index=False)
+    os.replace(tmp_path, tmp_path.removesuffix('.tmp'))  # Complete partial results only
+    return len(new_data)
+
+
+def run_shards(n_shards: int, mode: str = exe_mode):
+    """Scan every shard in a local process pool. Processes are spawned, not forked: stages run in threads, and a
+    fork could copy a lock held by another thread (logging, store) and deadlock
+    :param n_shards: number of shards
+    :param mode: execution mode ('local' or workflow)
+    :return: number of new videos found per shard.
+    """
+    context = multiprocessing.get_context('spawn')
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_shards, mp_context=context) as executor:
+        return list(executor.map(scan_shard, range(n_shards), [n_shards] * n_shards, [mode] * n_shards))
+
+
+def merge_shards(n_shards: int, logger: logging.Logger = None):
+    """Merge the partial results written by 'scan_shard' (removed by 'clear_shards' once the run is completed).
+    Failures of shards (and channels of missing shards) are added to 'youtube.SCAN_FAILED', and the journaled scan
+    window ends where the earliest shard window ended
+    :param n_shards: number of shards
+    :param logger: object for logging
+    :return new_data: new videos with statistics as pd.DataFrame (empty if no new video).
+    """
+    paths = sorted(glob.glob(f'{SHARDS_DIR}/shard_*_of_{n_shards}.csv'))
+    merged = {int(os.path.basename(path).split('_')[1]) for path in paths}
+
+    if len(paths) < n_shards and logger:
+        logger.warning('%s shard(s) missing out of %s, merging partial results.', n_shards - len(paths), n_shards)
+
+    youtube.SCAN_FAILED['channels'].update(channel_id for channel_id in all_channels
+                                           if shard_of(channel_id, n_shards) not in merged)
+
+    for path in paths:
+        failures = storage.load_json(path.replace('.csv', '.json'))
+        youtube.SCAN_FAILED['channels'].update(failures.get('channels', []))
+        youtube.SCAN_FAILED['videos'] += failures.get('videos', [])
+        if failures.get('window_end'):
+            youtube.limit_window(dt.datetime.fromisoformat(failures['window_end']))
+
+    parts = [pd.read_csv(path, encoding='utf-8') for path in paths if os.path.getsize(path) > 1]
+    new_data = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    if not new_data.empty:
+        new_data['release_date'] = pd.to_datetime(new_data.release_date, utc=True, format='ISO8601')
+        new_data = new_data.drop_duplicates('video_id')
+
+    return new_data
+
+
+def clear_shards(n_shards: int):
+    """Remove the partial results of shards, once the run they were merged in is completed
+    :param n_shards: number of shards.
+    """
+    for path in glob.glob(f'{SHARDS_DIR}/shard_*_of_{n_shards}.*'):  # Results, failures and unfinished writes
+        os.remove(path)
+
+
 def dest_playlist(channel_id: str, is_shorts: bool, v_duration: int, max_duration: int = 10):
     """Return destination playlist for addition
     :param channel_id: YouTube channel ID
@@ -120,6 +261,176 @@ def update_repo_secrets(secret_name: str, new_value: str, logger: logging.Logger
         sys.exit()
 
 
+def stage_scan(service, prog_bar: bool, logger: logging.Logger):
+    """Stage: search for new videos (whole scan, process pool or merge of shard results) and add their statistics
+    :param service: a Python YouTube Client
+    :param prog_bar: to use tqdm progress bar or not
+    :param logger: object for logging
+    :return new_data: new videos with statistics as pd.DataFrame (empty if no new video).
+    """
+    if shard_mode in ('merge', 'pool'):
+        if shard_mode == 'pool':
+            logger.info('Iterative research for %s YouTube channels in %s shards.', len(all_channels), shard_arg)
+            run_shards(int(shard_arg))
+        new_data = merge_shards(int(shard_arg), logger=logger)
+        records, now = new_data.to_dict('records'), pd.Timestamp.now(tz='UTC')
+
+        # Shards have their own video cache (not persisted) and do not write the shared snapshots store
+        storage.append_snapshots(records, observed_at=now)
+        youtube.cache_videos(records, fetched_at=now)
+        youtube.remember_videos(records)
+
+    else:
+        logger.info('Iterative research for %s YouTube channels.', len(all_channels))
+        new_data = scan(service, all_channels, prog_bar=prog_bar)
+
+    if new_data.empty:
+        logger.info('No addition to perform.')
+
+    else:
+        logger.info('Statistics added for %s video(s).', len(new_data))
+
+    return new_data
+
+
+def stage_weekly_stats(service, histo_data: pd.DataFrame):
+    """Stage: get statistics of already retrieved videos at each horizon (independent of the new videos scan)
+    :param service: a Python YouTube Client
+    :param histo_data: historical statistics
+    :return histo_data: historical statistics with new weekly statistics.
+    """
+    now = pd.Timestamp.now(tz='UTC')
+    tracked = histo_data.release_date > now - pd.Timedelta(weeks=storage.ACTIVE_WEEKS)
+
+    for week_delta in [1, 4, 12, 24]:
+        histo_data = youtube.weekly_stats(service=service, histo_data=histo_data, week_delta=week_delta)
+
+    # Only recent partitions can hold observations near horizons that are not final yet
+    snapshots = storage.read_snapshots(histo_data[storage.STATS_KEY][tracked],
+                                       since=now - storage.SNAPSHOT_LOOKBACK - storage.SNAPSHOT_TOLERANCE)
+    return storage.fill_from_snapshots(histo_data, snapshots, ref_date=now, lookback=storage.SNAPSHOT_LOOKBACK)
+
+
+def stage_store(updated_stats: pd.DataFrame, new_data: pd.DataFrame):
+    """Stage: store historical and new statistics (weekly statistics of new videos are left empty), completed videos
+    are moved to the archive
+    :param updated_stats: historical statistics with new weekly statistics
+    :param new_data: new videos with statistics.
+    """
+    if not new_data.empty:  # Resumed run: new videos may have been stored before the interruption
+        stored = np.isin(video_index.pack_ids(new_data.video_id), updated_stats[storage.STATS_KEY].values)
+        new_data = new_data.loc[~stored]
+
+    if not new_data.empty:
+        updated_stats = storage.concat_stats([updated_stats, storage.apply_stats_schema(new_data)])
+
+    storage.write_stats(storage.archive_stats(updated_stats), '../data/stats.csv')
+
+
+def stage_route(new_data: pd.DataFrame):
+    """Stage: define the destination playlist of each new video
+    :param new_data: new videos with statistics
+    :return: video IDs to add per destination playlist.
+    """
+    if new_data.empty:
+        return {}
+
+    destinations = new_data.apply(lambda row: dest_playlist(row.channel_id, row.is_shorts, row.duration), axis=1)
+    return new_data.groupby(destinations)['video_id'].apply(list).to_dict()
+
+
+def stage_insert(service, to_add: dict, prog_bar: bool, logger: logging.Logger):
+    """Stage: add new videos to playlists, by priority (Favorites > Music releases > Normal videos > Shorts)
+    :param service: a Python YouTube Client
+    :param to_add: video IDs to add per destination playlist
+    :param prog_bar: to use tqdm progress bar or not
+    :param logger: object for logging.
+    """
+    for playlist_id, playlist_name in [(banger, 'Banger Radar'), (release, 'Release Radar'),
+                                       (watch_later, 'Watch Later')]:
+        if to_add.get(playlist_id):
+            logger.info('Addition to "%s": %s video(s).', playlist_name, len(to_add[playlist_id]))
+            youtube.add_to_playlist(service, playlist_id, to_add[playlist_id], prog_bar=prog_bar)
+
+
+def stage_release_radar(service, new_data: pd.DataFrame, prog_bar: bool):
+    """Stage: fill Release Radar playlist (only when new videos were found)
+    :param service: a Python YouTube Client
+    :param new_data: new videos with statistics
+    :param prog_bar: to use tqdm progress bar or not.
+    """
+    if not new_data.empty:
+        youtube.fill_release_radar(service, release, re_listening, legacy, lmt=40, prog_bar=prog_bar)
+
+
+def stage_credentials(creds_b64: str, logger: logging.Logger):
+    """Stage: update credentials in base64, locally or as repository Secret
+    :param creds_b64: credentials in base64 (workflow mode)
+    :param logger: object for logging.
+    """
+    if exe_mode == 'local':
+        youtube.encode_key(json_path='../tokens/credentials.json')
+        youtube.encode_key(json_path='../tokens/oauth.json')
+
+    else:
+        update_repo_secrets(secret_name='CREDS_B64', new_value=creds_b64, logger=logger)
+
+
+def stage_compact():
+    """Stage: merge small chunks of the append-only history stores, move unpartitioned snapshots to their day."""
+    for store in ['../data/mix_history', '../data/release_radar_history']:
+        storage.compact_store(store_dir=store)
+
+    storage.partition_snapshots()
+
+
+def stage_seen_index(new_data: pd.DataFrame):
+    """Stage: record routed videos in the seen-video index
+    :param new_data: new videos with statistics.
+    """
+    if not new_data.empty:
+        SEEN.add(video_index.pack_ids(new_data.video_id))
+
+    SEEN.save()  # Also persists the index seeded from the statistics history
+
+
+def save_caches():
+    """Persist video metadata and the negative cache of dead / empty channels for next runs (main process only, shards
+    do not persist what they learn)."""
+    storage.save_video_cache(youtube.VIDEO_CACHE)
+    storage.save_json(youtube.NEGATIVE_CACHE, storage.NEGATIVE_CACHE_PATH)
+
+
+def build_stages():
+    """Declare main process stages with their inputs and outputs. Retry of previous API failures, new videos scan and
+    weekly statistics do not depend on each other and run concurrently.
+    :return: list of stages.
+    """
+    return [pipeline.stage('api_fail', lambda service, prog_bar: youtube.add_api_fail(service, prog_bar=prog_bar),
+                           inputs=['service', 'prog_bar'], outputs=['api_fail_done'], fallback=lambda **_: None),
+            pipeline.stage('scan', stage_scan, inputs=['service', 'prog_bar', 'logger'], outputs=['new_data'],
+                           fallback=lambda **_: pd.DataFrame()),
+            pipeline.stage('weekly_stats', stage_weekly_stats, inputs=['service', 'histo_data'],
+                           outputs=['updated_stats'], fallback=lambda histo_data, **_: histo_data),
+            pipeline.stage('store', stage_store, inputs=['updated_stats', 'new_data'], outputs=['stored'],
+                           fallback=lambda **_: None),
+            pipeline.stage('route', stage_route, inputs=['new_data'], outputs=['to_add'], fallback=lambda **_: {}),
+            pipeline.stage('insert', lambda api_fail_done, **kwargs: stage_insert(**kwargs),  # After API failures
+                           inputs=['api_fail_done', 'service', 'to_add', 'prog_bar', 'logger'], outputs=['inserted'],
+                           fallback=lambda **_: None),
+            pipeline.stage('seen_index', lambda inserted, **kwargs: stage_seen_index(**kwargs),  # After routing
+                           inputs=['inserted', 'new_data'], outputs=['seen_saved'], fallback=lambda **_: None),
+            pipeline.stage('release_radar', lambda inserted, **kwargs: stage_release_radar(**kwargs),
+                           inputs=['inserted', 'service', 'new_data', 'prog_bar'], outputs=['radar_filled'],
+                           fallback=lambda **_: None),
+            pipeline.stage('credentials', lambda radar_filled, stored, **kwargs: stage_credentials(**kwargs),
+                           inputs=['radar_filled', 'stored', 'creds_b64', 'logger'], outputs=['credentials']),
+            pipeline.stage('save_cache', lambda new_data, updated_stats: save_caches(),
+                           inputs=['new_data', 'updated_stats'], outputs=['cache_saved']),
+            pipeline.stage('compact', lambda radar_filled: stage_compact(), inputs=['radar_filled'],
+                           outputs=['compacted'])]
+
+
 if __name__ == '__main__':
     # Create loggers
     history_main = logging.Logger(name='history_main', level=0)
@@ -149,87 +460,37 @@ if __name__ == '__main__':
         YOUTUBE_OAUTH, CREDS_B64 = youtube.create_service_workflow()
         PROG_BAR = False  # Do not display progress bar
 
-    # Add missing videos due to quota exceeded on previous run
-    youtube.add_api_fail(service=YOUTUBE_OAUTH, prog_bar=PROG_BAR)
-
-    # Search for new videos to add
-    history_main.info('Iterative research for %s YouTube channels.', len(all_channels))
-    new_videos = youtube.iter_channels(YOUTUBE_OAUTH, all_channels, prog_bar=PROG_BAR)
-
-    if not new_videos:
-        history_main.info('No addition to perform.')
-
-        # Get stats for already retrieved videos
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=1)
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=4)
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=12)
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=24)
-
-        # Store
-        histo_data.sort_values(['release_date', 'video_id'], inplace=True)
-        histo_data.to_csv('../data/stats.csv', encoding='utf-8', index=False)
-
-    else:
-        # Add statistics about the videos for selection
-        history_main.info('Add statistics for %s video(s).', len(new_videos))
-        new_data = youtube.add_stats(service=YOUTUBE_OAUTH, video_list=new_videos)
-
-        # Prepare data for storing
-        to_keep = ['video_id', 'channel_id', 'release_date', 'status', 'is_shorts', 'duration', 'channel_name',
-                   'video_title']
-
-        stats_list = ['views_w1', 'views_w4', 'views_w12', 'views_w24', 'likes_w1', 'likes_w4', 'likes_w12',
-                      'likes_w24', 'comments_w1', 'comments_w4', 'comments_w12', 'comments_w24']
-
-        stored = new_data[to_keep]
-        stored.loc[:, stats_list] = [pd.NA] * len(stats_list)
-        stored = stored[to_keep[:-2] + stats_list + to_keep[-2:]]
-
-        # Get stats for already retrieved videos
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=1)
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=4)
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=12)
-        histo_data = youtube.weekly_stats(service=YOUTUBE_OAUTH, histo_data=histo_data, week_delta=24)
-
-        # Sort and store
-        stored = pd.concat([histo_data, stored]).sort_values(['release_date', 'video_id'])
-        stored.to_csv('../data/stats.csv', encoding='utf-8', index=False)
-
-        # Define destination playlist
-        new_data['dest_playlist'] = new_data.apply(lambda row: dest_playlist(row.channel_id,
-                                                                             row.is_shorts,
-                                                                             row.duration), axis=1)
-
-        # Reformat
-        to_add = new_data.groupby('dest_playlist')['video_id'].apply(list).to_dict()
-
-        # Selection by playlist # An error could happen here!
-        add_banger = to_add.get(banger, [])
-        add_release = to_add.get(release, [])
-        add_wl = to_add.get(watch_later, [])
+    if shard_mode == 'shard':  # Scan one shard only (separate process or CI job), routing is done by 'merge'
+        shard_idx, n_shard = map(int, shard_arg.split('/'))
+        n_new = scan_shard(shard_idx, n_shard, service=YOUTUBE_OAUTH)
+        history_main.info('Shard %s/%s scanned: %s new video(s).', shard_idx, n_shard, n_new)
+        sys.exit()
 
-        # Addition by priority (Favorites > Music releases > Normal videos > Shorts)
-        if add_banger:
-            history_main.info('Addition to "Banger Radar": %s video(s).', len(add_banger))
-            youtube.add_to_playlist(YOUTUBE_OAUTH, banger, add_banger, prog_bar=PROG_BAR)
+    youtube.start_journal()  # Resume an interrupted run, or start a new journal
 
-        if add_release:
-            history_main.info('Addition to "Release Radar": %s video(s).', len(add_release))
-            youtube.add_to_playlist(YOUTUBE_OAUTH, release, add_release, prog_bar=PROG_BAR)
+    context = {'service': YOUTUBE_OAUTH, 'creds_b64': CREDS_B64, 'prog_bar': PROG_BAR, 'logger': history_main,
+               'histo_data': histo_data}
+    timings = pipeline.run_stages(build_stages(), context, skip=STAGES_SKIP, only=STAGES_ONLY, profile=PROFILE,
+                                  logger=history_main)
+    history_main.info('Stage timings (s): %s', {name: round(sec, 2) for name, sec in timings.items() if sec})
 
-        if add_wl:
-            history_main.info('Addition to "Watch Later": %s video(s).', len(add_wl))
-            youtube.add_to_playlist(YOUTUBE_OAUTH, watch_later, add_wl, prog_bar=PROG_BAR)
+    if transport.ERRORS:  # Errors were retried or skipped, the run went on with partial results
+        history_main.warning('API errors by class: %s', dict(transport.ERRORS))
 
-        # Fill Release Radar playlist
-        youtube.fill_release_radar(YOUTUBE_OAUTH, release, re_listening, legacy, lmt=40, prog_bar=PROG_BAR)
+    if transport.BREAKER['open']:
+        history_main.error('API quota exhausted during the run, remaining calls skipped: %s',
+                           transport.BREAKER['error'].message)
 
-    if exe_mode == 'local':  # Credentials in base64 update - Local option
-        youtube.encode_key(json_path='../tokens/credentials.json')
-        youtube.encode_key(json_path='../tokens/oauth.json')
+    scan_failed = youtube.SCAN_FAILED['channels'] or youtube.SCAN_FAILED['videos']
 
-    else:  # Credentials in base64 update - Remote option
-        update_repo_secrets(secret_name='CREDS_B64', new_value=CREDS_B64, logger=history_main)
+    if scan_failed:
+        history_main.warning('Scan incomplete (%s channel(s), %s video(s) failed), resumed next run.',
+                             len(youtube.SCAN_FAILED['channels']), len(youtube.SCAN_FAILED['videos']))
 
+    # Next run scans from the end of this run's window, or resumes it if not scanned, incomplete or stopped by quota
+    if timings.get('scan') is not None and not scan_failed and not transport.BREAKER['open']:
+        youtube.finish_journal()
+        if shard_mode in ('merge', 'pool'):  # Kept until then to be merged again by a resumed run
+            clear_shards(int(shard_arg))
     history_main.info('Process ended.')  # End
     copy_last_exe_log()  # Copy what happened during process execution to the associated file.
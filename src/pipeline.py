@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import logging
+import profiling
+import time
+
+"""File Information
+@file_name: pipeline.py
+Script containing methods to run main.py stages as a dependency graph (stages declare their inputs and outputs,
+independent stages run concurrently).
+"""
+
+"GLOBAL"
+
+STAGE_WORKERS = 4  # Maximum number of stages running at the same time
+
+"FUNCTIONS"
+
+
+def stage(name: str, func, inputs: list = None, outputs: list = None, fallback=None):
+    """Declare a stage
+    :param name: stage name (used to skip or select it)
+    :param func: function called with the stage inputs as keyword arguments, returning its outputs (a single value
+    for one output, a tuple for several)
+    :param inputs: names of the values the stage needs (initial context or outputs of other stages)
+    :param outputs: names of the values the stage produces
+    :param fallback: function called like 'func' to produce the outputs when the stage is skipped (outputs are
+    unavailable if None)
+    :return: stage as dictionary.
+    """
+    return {'name': name, 'func': func, 'inputs': inputs or [], 'outputs': outputs or [], 'fallback': fallback}
+
+
+def check_stages(stages: list, context: dict):
+    """Check that stage names and outputs are unique, that every input is produced and that there is no cycle
+    :param stages: list of stages (see 'stage')
+    :param context: initial values.
+    """
+    names, producers = set(), {}
+
+    for stg in stages:
+        if stg['name'] in names:
+            raise ValueError(f"Duplicate stage name: '{stg['name']}'.")
+        names.add(stg['name'])
+
+        for output in stg['outputs']:
+            if output in producers or output in context:
+                raise ValueError(f"Output '{output}' of stage '{stg['name']}' is produced twice.")
+            producers[output] = stg['name']
+
+    available, pending = set(context), list(stages)
+
+    for stg in stages:
+        missing = [inp for inp in stg['inputs'] if inp not in producers and inp not in context]
+        if missing:
+            raise ValueError(f"Stage '{stg['name']}' needs unknown input(s): {missing}.")
+
+    while pending:  # Kahn's algorithm on values
+        ready = [stg for stg in pending if set(stg['inputs']) <= available]
+        if not ready:
+            raise ValueError(f"Dependency cycle between stages: {[stg['name'] for stg in pending]}.")
+        for stg in ready:
+            available.update(stg['outputs'])
+            pending.remove(stg)
+
+
+def call_stage(stg: dict, func, context: dict, profile: str = None):
+    """Call a stage (or its fallback) and map its result to its outputs
+    :param stg: stage (see 'stage')
+    :param func: function to call ('func' or 'fallback' of the stage)
+    :param context: available values
+    :param profile: profiling mode ('cprofile' or 'sample', see 'profiling.profile_call'), no profiling if None
+    :return: dictionary of outputs.
+    """
+    kwargs = {inp: context[inp] for inp in stg['inputs']}
+
+    if profile:
+        result = profiling.profile_call(stg['name'], func, kwargs, mode=profile)
+
+    else:
+        result = func(**kwargs)
+
+    if len(stg['outputs']) == 1:
+        return {stg['outputs'][0]: result}
+
+    return dict(zip(stg['outputs'], result or [None] * len(stg['outputs'])))
+
+
+def run_stages(stages: list, context: dict, skip: list = None, only: list = None, max_workers: int = STAGE_WORKERS,
+               profile: str = None, logger: logging.Logger = None):
+    """Run stages as soon as their inputs are available, independent stages in parallel threads
+    :param stages: list of stages (see 'stage')
+    :param context: initial values (updated in place with stage outputs)
+    :param skip: names of stages not to run (their fallback is used instead)
+    :param only: names of the only stages to run (every other stage is skipped), to re-run a single stage
+    :param max_workers: maximum number of stages running at the same time
+    :param profile: profiling mode ('cprofile' or 'sample'), stages then run one at a time so that CPU and memory
+    reports are not mixed up
+    :param logger: object for logging
+    :return timings: duration in seconds of each stage that ran (None for skipped stages).
+    """
+    check_stages(stages, context)
+    max_workers = 1 if profile else max_workers
+    unknown = set(skip or []).union(only or []) - {stg['name'] for stg in stages}
+
+    if unknown:
+        raise ValueError(f'Unknown stage(s): {sorted(unknown)}.')
+
+    skipped = {stg['name'] for stg in stages if stg['name'] in (skip or []) or (only and stg['name'] not in only)}
+    pending, running, timings = list(stages), {}, {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [stg for stg in pending if all(inp in context for inp in stg['inputs'])]
+
+            for stg in ready:
+                pending.remove(stg)
+
+                if stg['name'] in skipped:
+                    timings[stg['name']] = None
+
+                    if stg['fallback'] is not None:
+                        context.update(call_stage(stg, stg['fallback'], context))
+
+                    if logger:
+                        logger.info('Stage "%s" skipped.', stg['name'])
+                    continue
+
+                running[executor.submit(call_stage, stg, stg['func'], context, profile)] = (stg, time.perf_counter())
+
+            if ready and any(stg['name'] in skipped for stg in ready):
+                continue  # Fallback outputs may unlock other stages immediately
+
+            if not running:  # Remaining stages depend on outputs of skipped stages without fallback
+                if pending and logger:
+                    logger.warning('Stage(s) not run, missing inputs: %s.', [stg['name'] for stg in pending])
+                timings.update({stg['name']: None for stg in pending})
+                break
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                stg, start = running.pop(future)
+                context.update(future.result())  # Re-raise stage errors (and sys.exit) in the main thread
+                timings[stg['name']] = time.perf_counter() - start
+
+                if logger:
+                    logger.info('Stage "%s" done in %.2f s.', stg['name'], timings[stg['name']])
+
+    return timings
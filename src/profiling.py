@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+"""File Information
+@file_name: profiling.py
+Script containing methods to profile main.py stages (CPU time, memory peak, allocation sites and collapsed stacks for
+flame graphs).
+"""
+
+"GLOBAL"
+
+PROFILE_DIR = '../log/profiles'
+SAMPLE_INTERVAL = 0.005  # Seconds between two stack samples
+TOP = 25  # Number of functions / allocation sites in reports
+TRACE_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+                 tracemalloc.Filter(False, threading.__file__)]  # Profiling's own allocations
+
+"CLASSES"
+
+
+class StackSampler(threading.Thread):
+    """Thread sampling the call stack of another thread at regular intervals (collapsed stacks)."""
+
+    def __init__(self, thread_id: int, root, label: str, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.root = root  # Code object where sampled stacks start (excluded with its callers)
+        self.label = label
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # skipcq: PYL-W0212 - Only way to read another stack
+            stack = []
+
+            while frame is not None and frame.f_code is not self.root:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+
+            if stack:
+                self.stacks[';'.join([self.label] + stack[::-1])] += 1
+
+    def stop(self):
+        """Stop sampling and wait for the thread to end."""
+        self.stopped.set()
+        self.join()
+
+
+"FUNCTIONS"
+
+
+def sampled_top(stacks: collections.Counter, top: int = TOP):
+    """Functions with the most samples on top of the stack (self time) from collapsed stacks
+    :param stacks: sample count per collapsed stack
+    :param top: number of functions to keep
+    :return: report lines.
+    """
+    total = sum(stacks.values()) or 1
+    leaves = collections.Counter()
+
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+
+    return [f'{count:>8} {100 * count / total:6.1f}%  {func}' for func, count in leaves.most_common(top)]
+
+
+def profile_call(name: str, func, kwargs: dict, mode: str = 'cprofile', out_dir: str = PROFILE_DIR, top: int = TOP):
+    """Call a function under profiling and write its report ('{name}.txt') and collapsed stacks ('{name}.collapsed')
+    :param name: report name (stage name)
+    :param func: function to call
+    :param kwargs: keyword arguments of the function
+    :param mode: 'cprofile' (deterministic, every call counted) or 'sample' (stack sampling only, lower overhead)
+    :param out_dir: reports directory
+    :param top: number of functions / allocation sites in reports
+    :return: function result.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sampler = StackSampler(threading.get_ident(), root=sys._getframe().f_code, label=name)  # skipcq: PYL-W0212
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+    started_tracing = not tracemalloc.is_tracing()
+
+    if started_tracing:
+        tracemalloc.start()
+
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    start_cpu, start_wall = time.process_time(), time.perf_counter()
+    sampler.start()
+
+    if profiler:
+        profiler.enable()
+
+    try:
+        return func(**kwargs)
+
+    finally:
+        if profiler:
+            profiler.disable()
+
+        sampler.stop()
+        cpu, wall = time.process_time() - start_cpu, time.perf_counter() - start_wall
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        sites = after.compare_to(before.filter_traces(TRACE_FILTERS), 'lineno')[:top]
+
+        if started_tracing:
+            tracemalloc.stop()
+
+        lines = [f'Stage: {name}', f'Wall time: {wall:.3f} s', f'CPU time: {cpu:.3f} s',
+                 f'Peak traced memory: {peak / 1024 ** 2:.1f} MB', '', 'Top functions:']
+
+        if profiler:
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats('cumulative').print_stats(top)
+            lines.append(buffer.getvalue())
+
+        else:
+            lines += sampled_top(sampler.stacks, top) + ['']
+
+        lines += ['Allocation sites (memory still held at stage end):']
+        lines += [f'{stat.size_diff / 1024:>12.1f} KB {stat.count_diff:>+9} blocks  {stat.traceback}' for stat in sites]
+
+        with open(f'{out_dir}/{name}.txt', 'w', encoding='utf8') as report_file:
+            report_file.write('\n'.join(lines) + '\n')
+
+        with open(f'{out_dir}/{name}.collapsed', 'w', encoding='utf8') as stacks_file:
+            stacks_file.writelines(f'{stack} {count}\n' for stack, count in sampler.stacks.most_common())
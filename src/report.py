@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+import json
+import math
+import numpy as np
+import os
+import pandas as pd
+import plotly.graph_objects as go
+
+import analytics
+import storage
+
+"""File Information
+@file_name: report.py
+Script generating a static HTML dashboard of the statistics history (stats.csv) from pre-aggregated, time-bucketed
+data: the report size and render time do not depend on the number of videos.
+"""
+
+"GLOBAL"
+
+REPORT_PATH = '../reports/stats_report.html'
+BUCKETS_PATH = '../data/report_buckets.csv'  # Cached weekly aggregates per category
+BUCKET_FREQ = 'W-SUN'  # Weekly buckets (release week, from Monday to Sunday: periods are named by their end day)
+OPEN_WEEKS = 25  # Buckets of the last weeks are recomputed (weekly statistics still being filled)
+MAX_POINTS = 120  # Maximum number of points per series (consecutive weeks are merged beyond)
+TOP_CHANNELS = 25
+
+"FUNCTIONS"
+
+
+def weekly_buckets(stats: pd.DataFrame, categories: pd.Series):
+    """Aggregate videos per release week and category. Only mergeable aggregates are kept (counts, sums, sums of
+    logarithms), so that buckets can be combined later without the raw rows
+    :param stats: statistics table (storage.read_stats)
+    :param categories: category of each channel (analytics.channel_categories)
+    :return: pd.DataFrame with one row per (bucket, category).
+    """
+    frame = pd.DataFrame({'bucket': stats.release_date.dt.tz_convert(None).dt.to_period(BUCKET_FREQ).dt.start_time,
+                          'category': stats.channel_id.astype(str).map(categories).fillna('Other').values,
+                          'n_videos': 1,
+                          'n_shorts': stats.is_shorts.fillna(False).astype(int).values})
+
+    for week in storage.HORIZONS:
+        views = stats[f'views_w{week}'].astype('float64')
+        frame[f'n_views_w{week}'] = views.notna().astype(int).values
+        frame[f'sum_views_w{week}'] = views.fillna(0).values
+        frame[f'sum_log_views_w{week}'] = np.log1p(views).fillna(0).values
+        frame[f'sum_likes_w{week}'] = stats[f'likes_w{week}'].astype('float64').fillna(0).values
+
+    return frame.groupby(['bucket', 'category'], as_index=False).sum()
+
+
+def update_buckets(stats: pd.DataFrame, categories: pd.Series, cached: pd.DataFrame = None, now: pd.Timestamp = None):
+    """Update cached weekly aggregates: closed buckets are kept, the last OPEN_WEEKS weeks are recomputed
+    :param stats: statistics table (storage.read_stats)
+    :param categories: category of each channel (analytics.channel_categories)
+    :param cached: previously computed weekly aggregates (full computation if None, empty or with other week bounds)
+    :param now: reference date (current date by default)
+    :return: weekly aggregates.
+    """
+    if cached is None or cached.empty or (cached.bucket.dt.to_period(BUCKET_FREQ).dt.start_time != cached.bucket).any():
+        return weekly_buckets(stats, categories)
+
+    now = now or pd.Timestamp.now(tz='UTC')
+    cutoff = (now.tz_convert(None) - pd.Timedelta(weeks=OPEN_WEEKS)).to_period(BUCKET_FREQ).start_time
+    fresh = weekly_buckets(stats.loc[stats.release_date.dt.tz_convert(None) >= cutoff], categories)
+    return pd.concat([cached.loc[cached.bucket < cutoff], fresh], ignore_index=True)
+
+
+def load_buckets(path: str = BUCKETS_PATH):
+    """Load cached weekly aggregates
+    :param path: CSV file path
+    :return: pd.DataFrame (None if no file yet).
+    """
+    if not os.path.exists(path):
+        return None
+
+    return pd.read_csv(path, encoding='utf-8', parse_dates=['bucket'])
+
+
+def save_buckets(buckets: pd.DataFrame, path: str = BUCKETS_PATH):
+    """Store weekly aggregates
+    :param buckets: weekly aggregates
+    :param path: CSV file path.
+    """
+    buckets.sort_values(['bucket', 'category']).to_csv(path, encoding='utf-8', index=False)
+
+
+def downsample(buckets: pd.DataFrame, max_points: int = MAX_POINTS):
+    """Merge consecutive weekly buckets so that each category has at most max_points points, then derive metrics
+    :param buckets: weekly aggregates
+    :param max_points: maximum number of points per category
+    :return: pd.DataFrame with one row per (merged bucket, category) and derived metrics.
+    """
+    if buckets.empty:
+        return buckets
+
+    first = buckets.bucket.min()
+    n_weeks = (buckets.bucket.max() - first).days // 7 + 1
+    width = max(1, math.ceil(n_weeks / max_points))  # Weeks per point
+    merged = buckets.assign(bucket=first + pd.to_timedelta((buckets.bucket - first).dt.days // (7 * width) * 7 * width,
+                                                           unit='D'))
+    merged = merged.groupby(['bucket', 'category'], as_index=False).sum()
+
+    for week in storage.HORIZONS:
+        count = merged[f'n_views_w{week}'].replace(0, np.nan)
+        merged[f'geo_mean_views_w{week}'] = np.expm1(merged[f'sum_log_views_w{week}'] / count)
+        merged[f'like_rate_w{week}'] = merged[f'sum_likes_w{week}'] / merged[f'sum_views_w{week}'].replace(0, np.nan)
+
+    merged['shorts_share'] = merged.n_shorts / merged.n_videos
+    return merged
+
+
+def category_figure(data: pd.DataFrame, metric: str, title: str, kind: str = 'line'):
+    """Build a figure with one trace per category
+    :param data: downsampled aggregates
+    :param metric: column to plot
+    :param title: figure title
+    :param kind: 'line' or 'bar' (stacked)
+    :return: plotly Figure.
+    """
+    fig = go.Figure()
+
+    for category, group in data.groupby('category'):
+        if kind == 'bar':
+            fig.add_trace(go.Bar(x=group.bucket, y=group[metric], name=category))
+        else:
+            fig.add_trace(go.Scatter(x=group.bucket, y=group[metric], name=category, mode='lines'))
+
+    fig.update_layout(title=title, barmode='stack', template='plotly_white', height=420)
+    return fig
+
+
+def channels_figure(aggregates: pd.DataFrame, names: pd.Series, top: int = TOP_CHANNELS):
+    """Build a table of the channels with the highest median first-week views
+    :param aggregates: channel aggregates (analytics.update_aggregates)
+    :param names: channel name of each channel ID
+    :param top: number of channels
+    :return: plotly Figure.
+    """
+    best = aggregates.sort_values('median_views_w1', ascending=False).head(top)
+    columns = {'Channel': names.reindex(best.index).fillna(pd.Series(best.index, index=best.index)),
+               'Videos': best.n_videos,
+               'Median views (W1)': best.median_views_w1.round(0),
+               'Median views (W4)': best.median_views_w4.round(0),
+               'Like rate (W4)': best.like_rate_w4.round(4)}
+    fig = go.Figure(go.Table(header={'values': list(columns)}, cells={'values': [col.tolist()
+                                                                               for col in columns.values()]}))
+    fig.update_layout(title=f'Top {top} channels (median views after one week)', height=120 + 28 * len(best))
+    return fig
+
+
+def render_report(data: pd.DataFrame, aggregates: pd.DataFrame, names: pd.Series, path: str = REPORT_PATH):
+    """Write the static HTML dashboard (plotly.js loaded from CDN, data limited to downsampled aggregates)
+    :param data: downsampled aggregates
+    :param aggregates: channel aggregates
+    :param names: channel name of each channel ID
+    :param path: HTML file path.
+    """
+    figures = [category_figure(data, 'n_videos', 'Videos released per category', kind='bar'),
+               category_figure(data, 'geo_mean_views_w1', 'Typical views after one week (geometric mean)'),
+               category_figure(data, 'geo_mean_views_w4', 'Typical views after four weeks (geometric mean)'),
+               category_figure(data, 'like_rate_w4', 'Like rate after four weeks'),
+               category_figure(data, 'shorts_share', 'Share of shorts'),
+               channels_figure(aggregates, names)]
+    body = [fig.to_html(full_html=False, include_plotlyjs='cdn' if idx == 0 else False)
+            for idx, fig in enumerate(figures)]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w', encoding='utf-8') as report_file:
+        report_file.write('<html><head><meta charset="utf-8"><title>Statistics report</title></head><body>'
+                          + ''.join(body) + '</body></html>')
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    with open('../data/pocket_tube.json', 'r', encoding='utf8') as pt_file:
+        channel_cat = analytics.channel_categories(json.load(pt_file))
+
+    histo_data = storage.read_stats_history('../data/stats.csv')
+
+    report_buckets = update_buckets(histo_data, channel_cat, load_buckets())
+    save_buckets(report_buckets)
+
+    channel_agg = analytics.update_aggregates(histo_data, analytics.load_aggregates())
+    analytics.save_aggregates(channel_agg)
+
+    channel_names = histo_data.drop_duplicates('channel_id', keep='last').set_index('channel_id').channel_name
+    render_report(downsample(report_buckets), channel_agg, channel_names.astype(str))
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+import json
+import math
+import os
+import pandas as pd
+import re
+
+import storage
+
+pd.set_option('display.max_columns', None)  # pd.set_option('display.max_rows', None)
+pd.set_option('display.width', 250)
+
+"""File Information
+@file_name: simulator.py
+Script simulating the API quota and runtime cost of a main.py run, without any API call.
+"""
+
+"GLOBAL"
+
+# YouTube API V3 quota cost (units) of each call type
+UNIT_COSTS = {'playlistItems.list': 1, 'videos.list': 1, 'channels.list': 1,
+              'playlistItems.insert': 50, 'playlistItems.delete': 50, 'playlistItems.update': 50}
+
+DAILY_QUOTA = 10_000  # Default daily quota of a Google Cloud project
+CI_TIME_LIMIT = 6 * 3600  # GitHub Actions job time limit in seconds
+
+LATENCY = {'api': 0.35,  # Seconds per API round trip (single call or batch request)
+           'batch_call': 0.02,  # Additional seconds per call inside a batch request
+           'shorts_probe': 0.25,  # Seconds per HEAD request on youtube.com/shorts
+           'insert': 0.6}  # Seconds per playlist insertion / deletion (server-side processing)
+
+"FUNCTIONS"
+
+
+def runs_per_day(log_path: str = '../log/history.log', days: int = 14, default: float = 24.0):
+    """Estimate the number of runs per day from the history log
+    :param log_path: history log file path
+    :param days: number of last days to consider
+    :param default: value returned if the log is missing
+    :return: average number of runs per day.
+    """
+    if not os.path.exists(log_path):
+        return default
+
+    with open(log_path, 'r', encoding='utf8') as log_file:
+        starts = re.findall(r'(\d{4}-\d{2}-\d{2}) \d{2}:\d{2}:\d{2}\S* \[INFO] - Process started\.', log_file.read())
+
+    if not starts:
+        return default
+
+    per_day = pd.Series(starts).value_counts().sort_index().tail(days)
+    return float(per_day.mean())
+
+
+def upload_profile(stats: pd.DataFrame, n_channels: int, days: int = 90):
+    """Describe recent upload activity from the statistics history
+    :param stats: statistics table (storage.read_stats)
+    :param n_channels: number of tracked channels
+    :param days: number of last days to consider
+    :return: dictionary with uploads per channel per day and shorts share.
+    """
+    latest = stats.release_date.max()
+    recent = stats.loc[stats.release_date > latest - pd.Timedelta(days=days)]
+
+    if recent.empty:
+        return {'uploads_per_channel_day': 0.0, 'shorts_share': 0.0}
+
+    return {'uploads_per_channel_day': len(recent) / days / max(n_channels, 1),
+            'shorts_share': float(recent.is_shorts.fillna(False).mean())}
+
+
+def simulate_run(n_channels: int, profile: dict, n_runs_day: float, api_failures: int = 0, refill: int = 5,
+                 batch: bool = True, cache_hit: float = 1.0):
+    """Model one run of main.py: calls, quota units and wall time for each stage
+    :param n_channels: number of channels to scan
+    :param profile: upload profile (see 'upload_profile')
+    :param n_runs_day: number of runs per day
+    :param api_failures: videos left to add from previous API failures
+    :param refill: videos moved into Release Radar by 'fill_release_radar'
+    :param batch: batch requests are used (50 calls per round trip) or not
+    :param cache_hit: share of weekly stats videos already in video cache (no shorts probe)
+    :return: pd.DataFrame with one row per stage.
+    """
+    new_videos = n_channels * profile['uploads_per_channel_day'] / n_runs_day
+    routed = new_videos * (1 - profile['shorts_share'])  # Shorts are never added
+    weekly_videos = 4 * n_channels * profile['uploads_per_channel_day'] / n_runs_day  # One day per horizon
+
+    def round_trips(calls: float):
+        """Number of HTTP round trips for a number of calls
+        :param calls: number of API calls
+        :return: number of round trips.
+        """
+        return math.ceil(calls / 50) if batch else math.ceil(calls)
+
+    stages = [('add_api_fail', 'playlistItems.insert', api_failures, 0),
+              ('iter_channels', 'playlistItems.list', n_channels, 0),
+              ('add_stats', 'videos.list', math.ceil(new_videos / 50), new_videos),
+              ('weekly_stats', 'videos.list', 4 * math.ceil(weekly_videos / 4 / 50),
+               weekly_videos * (1 - cache_hit)),
+              ('add_to_playlist', 'playlistItems.insert', routed, 0),
+              ('fill_release_radar', 'playlistItems.list', 3, 0),
+              ('fill_release_radar (insert)', 'playlistItems.insert', refill, 0),
+              ('fill_release_radar (delete)', 'playlistItems.delete', refill, 0)]
+
+    rows = []
+
+    for stage, call_type, calls, probes in stages:
+        trips = round_trips(calls)
+        seconds = trips * LATENCY['api'] + calls * LATENCY['batch_call'] * batch + probes * LATENCY['shorts_probe']
+
+        if call_type in ('playlistItems.insert', 'playlistItems.delete'):
+            seconds += calls * LATENCY['insert']
+
+        rows.append({'stage': stage, 'call_type': call_type, 'calls': calls, 'round_trips': trips,
+                     'shorts_probes': probes, 'units': calls * UNIT_COSTS[call_type], 'seconds': seconds})
+
+    return pd.DataFrame(rows)
+
+
+def project(n_channels: int, profile: dict, n_runs_day: float, scales: list = (1, 1.5, 2, 3, 5), **kwargs):
+    """Project run and daily costs for scaled-up channel counts
+    :param n_channels: current number of channels
+    :param profile: upload profile (see 'upload_profile')
+    :param n_runs_day: number of runs per day
+    :param scales: channel count multipliers
+    :param kwargs: additional parameters for 'simulate_run'
+    :return: pd.DataFrame with one row per scale.
+    """
+    rows = []
+
+    for scale in scales:
+        run = simulate_run(math.ceil(n_channels * scale), profile, n_runs_day, **kwargs)
+        daily_units = run.units.sum() * n_runs_day
+        rows.append({'scale': scale,
+                     'channels': math.ceil(n_channels * scale),
+                     'calls_per_run': run.calls.sum(),
+                     'units_per_run': run.units.sum(),
+                     'units_per_day': daily_units,
+                     'quota_share': daily_units / DAILY_QUOTA,
+                     'seconds_per_run': run.seconds.sum(),
+                     'ci_time_share': run.seconds.sum() / CI_TIME_LIMIT})
+
+    return pd.DataFrame(rows)
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    with open('../data/pocket_tube.json', 'r', encoding='utf8') as pt_file:
+        pocket_tube = json.load(pt_file)
+
+    with open('../data/api_failure.json', 'r', encoding='utf-8') as api_failure_file:
+        n_failures = sum(len(info['failure']) for info in json.load(api_failure_file).values())
+
+    now = pd.Timestamp.now(tz='UTC')
+    skipped = {channel_id for channel_id, entry in storage.load_json(storage.NEGATIVE_CACHE_PATH).items()
+               if entry['until'] and pd.Timestamp(entry['until']) > now}  # Same rule as youtube.is_skipped
+
+    channels = {channel_id for category, ids in pocket_tube.items() if 'ysc' not in category for channel_id in ids}
+    n_scanned = len(channels - skipped)
+    upload_prof = upload_profile(storage.read_stats('../data/stats.csv'), n_scanned)
+    runs = runs_per_day()
+
+    print(simulate_run(n_scanned, upload_prof, runs, api_failures=n_failures))
+    print(project(n_scanned, upload_prof, runs, api_failures=n_failures))
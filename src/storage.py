@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+
+import datetime as dt
+import glob
+import itertools
+import json
+import numpy as np
+import os
+import pandas as pd
+import threading
+
+import video_index
+
+"""File Information
+@file_name: storage.py
+Script containing methods to load and store data files produced by youtube.py / main.py (statistics table schema,
+append-only chunked stores, statistics snapshots and archive, video cache, checkpoint journal, negative cache).
+"""
+
+"GLOBAL"
+
+CHUNK_MAX_BYTES = 8 * 1024 ** 2  # Size at which the current chunk is closed and a new one is started
+COMPACT_TARGET_BYTES = 64 * 1024 ** 2  # Size targeted by compaction when merging small chunks
+STORE_LOCK = threading.Lock()  # Serialize appends from concurrent stages (same process)
+
+# Declared schema of the statistics table (stats.csv), applied once at load and kept through every stage
+PRIVACY_STATUS = pd.CategoricalDtype(['public', 'unlisted', 'private', 'privacyStatusUnspecified', 'deleted'])
+
+STATS_SCHEMA = {'video_id': 'string',
+                'channel_id': 'category',
+                'release_date': 'datetime64[ns, UTC]',
+                'status': PRIVACY_STATUS,
+                'is_shorts': 'boolean',
+                'duration': 'UInt32',
+                'views_w1': 'UInt64', 'views_w4': 'UInt64', 'views_w12': 'UInt64', 'views_w24': 'UInt64',
+                'likes_w1': 'UInt32', 'likes_w4': 'UInt32', 'likes_w12': 'UInt32', 'likes_w24': 'UInt32',
+                'comments_w1': 'UInt32', 'comments_w4': 'UInt32', 'comments_w12': 'UInt32', 'comments_w24': 'UInt32',
+                'channel_name': 'category',
+                'video_title': 'string'}
+
+STATS_COLUMNS = list(STATS_SCHEMA.keys())
+STATS_KEY = 'video_key'  # Packed video ID (video_index.pack_ids), added at load: int64 key of joins and lookups
+
+# Statistics archive: videos past the tracking window are moved out of stats.csv (active set) into immutable segments,
+# sorted and compressed once
+ARCHIVE_DIR = '../data/stats_archive'
+ACTIVE_WEEKS = 25  # Tracking window: weekly statistics (up to 24 weeks) and their snapshot estimates are final after it
+ARCHIVE_MIN_ROWS = 5_000  # Completed videos needed to write a new segment (fewer, bigger segments)
+
+# Long-format snapshots of video statistics, one row per video and observation (written by youtube.get_stats). The
+# wide weekly statistics of stats.csv are derived from them (see 'fill_from_snapshots')
+SNAPSHOTS_DIR = '../data/snapshots'  # One store per observation day (partition), e.g. snapshots/2026-01-31
+SNAPSHOT_TOLERANCE = dt.timedelta(days=3)  # Maximum distance between a target date and the observations used
+SNAPSHOT_LOOKBACK = dt.timedelta(weeks=1)  # Older target dates are final: no new observation can fall near them
+SNAPSHOT_COLUMNS = ['video_id', 'observed_at', 'views', 'likes', 'comments', 'status']
+HORIZONS = [1, 4, 12, 24]  # Weeks after release at which statistics are snapshotted (wide stats.csv columns)
+
+# Persistent video cache: immutable fields are kept forever, volatile ones are reused for a short time only
+VIDEO_CACHE_PATH = '../data/video_cache.csv'
+VIDEO_IMMUTABLE = ['duration', 'is_shorts', 'video_title', 'channel_id', 'channel_name', 'release_date']
+VIDEO_VOLATILE = ['views', 'likes', 'comments', 'live_status', 'latest_status']
+VOLATILE_TTL = dt.timedelta(hours=6)
+
+# Checkpoint journal: scan window and progress of the current run (completed channels, enriched videos, inserts)
+CHECKPOINT_PATH = '../data/checkpoint.json'
+
+# Negative cache: channels repeatedly not found (404) or without any upload, skipped for an exponentially growing time
+NEGATIVE_CACHE_PATH = '../data/negative_cache.json'
+NEGATIVE_MIN_STRIKES = 2  # Consecutive failed probes before a channel is skipped
+NEGATIVE_TTL = dt.timedelta(days=1)  # Skip duration after NEGATIVE_MIN_STRIKES failures, doubled at each new failure
+NEGATIVE_TTL_MAX = dt.timedelta(days=64)
+
+"FUNCTIONS"
+
+
+def apply_stats_schema(data: pd.DataFrame):
+    """Cast a statistics table to the declared schema (columns ordered as in stats.csv, then the packed key)
+    :param data: statistics table, whatever its current types
+    :return data: statistics table with compact types.
+    """
+    data = data.reindex(columns=STATS_COLUMNS)
+    data['release_date'] = pd.to_datetime(data.release_date, utc=True, format='ISO8601')
+    data = data.astype({col: dtype for col, dtype in STATS_SCHEMA.items() if col != 'release_date'})
+    data[STATS_KEY] = video_index.pack_ids(data.video_id)
+    return data
+
+
+def read_stats(path: str = '../data/stats.csv'):
+    """Load the statistics table with its declared schema and its packed key column (STATS_KEY)
+    :param path: CSV file path
+    :return: statistics table as pd.DataFrame.
+    """
+    counters = [col for col, dtype in STATS_SCHEMA.items() if str(dtype).startswith('UInt')]
+    others = {col: dtype for col, dtype in STATS_SCHEMA.items() if col not in counters + ['release_date']}
+
+    # Counters are parsed as float64 then cast: the CSV parser is several times slower on nullable integers
+    data = pd.read_csv(path, encoding='utf-8', dtype={**others, **{col: 'float64' for col in counters}})
+    data = data.astype({col: STATS_SCHEMA[col] for col in counters})
+    data['release_date'] = pd.to_datetime(data.release_date, utc=True, format='ISO8601')
+    data = data[STATS_COLUMNS].copy()
+    data[STATS_KEY] = video_index.pack_ids(data.video_id)
+    return data
+
+
+def concat_stats(frames: list):
+    """Concatenate statistics tables without losing categorical types (categories are unified first)
+    :param frames: list of statistics tables following the declared schema
+    :return: concatenated statistics table.
+    """
+    for col in [col for col, dtype in STATS_SCHEMA.items() if dtype == 'category']:
+        categories = pd.api.types.union_categoricals([frame[col] for frame in frames]).categories
+        frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_stats_history(path: str = '../data/stats.csv', archive_dir: str = ARCHIVE_DIR):
+    """Load the whole statistics history: archive segments then active set (for analytics, the daily stages only
+    need the active set, see 'read_stats')
+    :param path: CSV file path of the active set
+    :param archive_dir: archive directory
+    :return: statistics table as pd.DataFrame.
+    """
+    frames = [read_stats(segment) for segment in list_segments(archive_dir)] + [read_stats(path)]
+    data = concat_stats(frames) if len(frames) > 1 else frames[0]
+    return data.drop_duplicates(STATS_KEY, ignore_index=True)  # Archived twice if interrupted between two writes
+
+
+def list_segments(archive_dir: str = ARCHIVE_DIR):
+    """List the segment files of the statistics archive, in writing order
+    :param archive_dir: archive directory
+    :return: sorted list of segment file paths.
+    """
+    return sorted(glob.glob(os.path.join(archive_dir, 'segment-*.csv.gz')))
+
+
+def archive_stats(data: pd.DataFrame, ref_date: dt.datetime = None, archive_dir: str = ARCHIVE_DIR,
+                  min_rows: int = ARCHIVE_MIN_ROWS):
+    """Move completed videos (released before the tracking window) into a new archive segment, written atomically
+    and never modified afterwards
+    :param data: statistics table following the declared schema
+    :param ref_date: reference date (now by default)
+    :param archive_dir: archive directory (created if needed)
+    :param min_rows: completed videos needed to write a segment (kept in the active set until then)
+    :return data: active statistics table.
+    """
+    ref_date = pd.Timestamp(ref_date or dt.datetime.now(dt.timezone.utc)).tz_convert('UTC')
+    completed = data.release_date < ref_date - dt.timedelta(weeks=ACTIVE_WEEKS)
+
+    if completed.sum() < min_rows:
+        return data
+
+    segments = list_segments(archive_dir)
+    number = int(os.path.basename(segments[-1])[8:13]) if segments else 0
+    path = os.path.join(archive_dir, f'segment-{number + 1:05d}.csv.gz')
+    os.makedirs(archive_dir, exist_ok=True)
+
+    segment = data.loc[completed].sort_values(['release_date', 'video_id'])[STATS_COLUMNS]
+    segment.to_csv(f'{path}.tmp', encoding='utf-8', index=False, compression={'method': 'gzip', 'mtime': 0})
+    os.replace(f'{path}.tmp', path)
+    return data.loc[~completed].reset_index(drop=True)
+
+
+def write_stats(data: pd.DataFrame, path: str = '../data/stats.csv'):
+    """Sort and store the statistics table (the packed key is not stored, video IDs are its shortest text form)
+    :param data: statistics table following the declared schema
+    :param path: CSV file path.
+    """
+    data.sort_values(['release_date', 'video_id'])[STATS_COLUMNS].to_csv(path, encoding='utf-8', index=False)
+
+
+def list_partitions(store_dir: str = SNAPSHOTS_DIR, since: dt.datetime = None, until: dt.datetime = None):
+    """List the partitions (one per observation day) of the snapshots store
+    :param store_dir: snapshots store directory
+    :param since: first observation date to keep (no limit if None)
+    :param until: last observation date to keep (no limit if None)
+    :return: sorted list of partition directories.
+    """
+    first = None if since is None else pd.Timestamp(since).tz_convert('UTC').strftime('%Y-%m-%d')
+    last = None if until is None else pd.Timestamp(until).tz_convert('UTC').strftime('%Y-%m-%d')
+    return [path for path in sorted(glob.glob(os.path.join(store_dir, '????-??-??')))
+            if (first is None or os.path.basename(path) >= first) and (last is None or os.path.basename(path) <= last)]
+
+
+def append_snapshots(items: list, observed_at: dt.datetime, store_dir: str = SNAPSHOTS_DIR):
+    """Record video statistics as long-format snapshots, in the partition of the observation day
+    :param items: video statistics as returned by 'youtube.get_stats'
+    :param observed_at: observation datetime (timezone-aware)
+    :param store_dir: snapshots store directory.
+    """
+    observed_at = pd.Timestamp(observed_at).tz_convert('UTC')
+    snapshots = pd.DataFrame(items, columns=['video_id', 'views', 'likes', 'comments', 'latest_status'])
+    snapshots = snapshots.rename(columns={'latest_status': 'status'})
+    snapshots.insert(1, 'observed_at', observed_at.isoformat())
+    append_rows(os.path.join(store_dir, observed_at.strftime('%Y-%m-%d')), snapshots[SNAPSHOT_COLUMNS])
+
+
+def partition_snapshots(store_dir: str = SNAPSHOTS_DIR):
+    """Move the chunks written before partitioning (store root) into the partitions of their observation days
+    :param store_dir: snapshots store directory
+    :return: number of chunks moved.
+    """
+    chunks = list_chunks(store_dir)
+
+    for path in chunks:
+        for part in pd.read_csv(path, encoding='utf8', chunksize=100_000, dtype={'video_id': str}):
+            for day, rows in part.groupby(part.observed_at.str[:10]):  # ISO dates in UTC
+                append_rows(os.path.join(store_dir, day), rows[SNAPSHOT_COLUMNS])
+        os.remove(path)
+
+    return len(chunks)
+
+
+def read_snapshots(video_keys=None, since: dt.datetime = None, until: dt.datetime = None,
+                   store_dir: str = SNAPSHOTS_DIR):
+    """Load snapshots, streaming the partitions of the selected observation days and keeping selected videos only
+    :param video_keys: packed video IDs to keep (see STATS_KEY, all videos if None)
+    :param since: first observation date to read (no limit if None)
+    :param until: last observation date to read (no limit if None)
+    :param store_dir: snapshots store directory
+    :return snapshots: pd.DataFrame sorted by observation date, with the packed key column.
+    """
+    keep = None if video_keys is None else np.unique(np.asarray(video_keys, dtype=np.int64))
+    stores = ([store_dir] if list_chunks(store_dir) else []) + list_partitions(store_dir, since, until)  # Not moved yet
+    parts = []
+
+    for part in itertools.chain.from_iterable(iter_rows(store) for store in stores):
+        part[STATS_KEY] = video_index.pack_ids(part.video_id.astype(str))
+        parts.append(part if keep is None else part.loc[part[STATS_KEY].isin(keep)])
+
+    snapshots = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=SNAPSHOT_COLUMNS + [STATS_KEY])
+    snapshots = snapshots.astype({'video_id': 'string', 'views': 'float64', 'likes': 'float64',
+                                  'comments': 'float64', 'status': PRIVACY_STATUS, STATS_KEY: 'int64'})
+    snapshots['observed_at'] = pd.to_datetime(snapshots.observed_at, utc=True, format='ISO8601')
+    return snapshots.sort_values('observed_at', ignore_index=True)
+
+
+def snapshots_at(snapshots: pd.DataFrame, targets: pd.DataFrame, tolerance: dt.timedelta = SNAPSHOT_TOLERANCE):
+    """Estimate statistics at target dates from the closest snapshots
+    Values are linearly interpolated between the observations surrounding the target date, or taken from the
+    nearest observation if there is only one within tolerance.
+    :param snapshots: snapshots as returned by 'read_snapshots'
+    :param targets: pd.DataFrame with packed key (STATS_KEY) and 'target_at' (UTC) columns
+    :param tolerance: maximum distance between target date and observations
+    :return estimates: targets with 'views', 'likes' and 'comments' columns (NaN if no close observation).
+    """
+    metrics = ['views', 'likes', 'comments']
+    targets = targets.astype({STATS_KEY: 'int64'}).sort_values('target_at')
+    sides = {}
+
+    for direction in ['backward', 'forward']:
+        sides[direction] = pd.merge_asof(targets, snapshots[[STATS_KEY, 'observed_at'] + metrics],
+                                         left_on='target_at', right_on='observed_at', by=STATS_KEY,
+                                         direction=direction, tolerance=tolerance).set_index(targets.index)
+
+    before, after = sides['backward'], sides['forward']
+    span = (after.observed_at - before.observed_at).dt.total_seconds()
+    weight = ((targets.target_at - before.observed_at).dt.total_seconds() / span).where(span > 0, 0)
+    estimates = targets.copy()
+
+    for metric in metrics:
+        interpolated = before[metric] + weight * (after[metric] - before[metric])
+        estimates[metric] = interpolated.fillna(before[metric]).fillna(after[metric]).round()
+
+    return estimates.sort_index()
+
+
+def fill_from_snapshots(stats: pd.DataFrame, snapshots: pd.DataFrame, horizons: list = None,
+                        ref_date: dt.datetime = None, lookback: dt.timedelta = None):
+    """Derive the wide weekly statistics ('views_wX', ...) from snapshots, filling missing values only
+    :param stats: statistics table following the declared schema
+    :param snapshots: snapshots as returned by 'read_snapshots'
+    :param horizons: weeks after release to derive (any number of weeks, stats.csv ones by default)
+    :param ref_date: reference date, horizons after it are left empty (now by default)
+    :param lookback: horizons reached more than lookback before ref_date are left as they are (no limit if None)
+    :return stats: statistics table with derived values.
+    """
+    ref_date = pd.Timestamp(ref_date or dt.datetime.now(dt.timezone.utc)).tz_convert('UTC')
+
+    for week in horizons or HORIZONS:
+        target_at = stats.release_date + dt.timedelta(weeks=week)
+        column = f'views_w{week}'
+        missing = (target_at <= ref_date) & stats[STATS_KEY].isin(snapshots[STATS_KEY])
+        if lookback is not None:
+            missing &= target_at >= ref_date - lookback
+        if column in stats:
+            missing &= stats[column].isna()
+
+        if not missing.any():
+            continue
+
+        targets = pd.DataFrame({STATS_KEY: stats[STATS_KEY][missing], 'target_at': target_at[missing]})
+        estimates = snapshots_at(snapshots, targets)
+
+        for metric in ['views', 'likes', 'comments']:
+            column = f'{metric}_w{week}'
+            dtype = STATS_SCHEMA.get(column, 'UInt64')
+            if column not in stats:
+                stats[column] = pd.array([pd.NA] * len(stats), dtype=dtype)
+            stats.loc[missing, column] = stats.loc[missing, column].fillna(estimates[metric].astype(dtype))
+
+    return stats
+
+
+def load_video_cache(path: str = VIDEO_CACHE_PATH):
+    """Load the persistent video cache
+    :param path: CSV file path
+    :return: dictionary {video_id: {field: value}} (empty if no file yet).
+    """
+    if not os.path.exists(path):
+        return {}
+
+    cache = pd.read_csv(path, encoding='utf-8', dtype={'video_id': str, 'channel_id': str}).set_index('video_id')
+    cache = cache.astype(object).where(cache.notna(), None)  # Missing values as None
+    return cache.to_dict('index')
+
+
+def save_video_cache(cache: dict, path: str = VIDEO_CACHE_PATH):
+    """Store the persistent video cache (atomic replace)
+    :param cache: dictionary {video_id: {field: value}}
+    :param path: CSV file path.
+    """
+    columns = VIDEO_IMMUTABLE + VIDEO_VOLATILE + ['fetched_at']
+    data = pd.DataFrame.from_dict(cache, orient='index').reindex(columns=columns)
+    data.index.name = 'video_id'
+    data.to_csv(f'{path}.tmp', encoding='utf-8')
+    os.replace(f'{path}.tmp', path)
+
+
+def is_fresh(entry: dict, now: dt.datetime, ttl: dt.timedelta = VOLATILE_TTL):
+    """Check if the volatile fields of a cached video can be reused
+    :param entry: cached video (None if unknown)
+    :param now: reference datetime (timezone-aware)
+    :param ttl: time-to-live of volatile fields
+    :return: True if volatile fields were fetched less than 'ttl' ago.
+    """
+    if not entry or not entry.get('fetched_at'):
+        return False
+
+    return now - dt.datetime.fromisoformat(entry['fetched_at']) < ttl
+
+
+def load_json(path: str):
+    """Load a JSON state file (checkpoint journal, negative cache)
+    :param path: JSON file path
+    :return: content as dictionary (empty if no file yet).
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, 'r', encoding='utf-8') as json_file:
+        return json.load(json_file)
+
+
+def save_json(data: dict, path: str):
+    """Store a JSON state file atomically: a crash while writing leaves the previous file intact
+    :param data: content as dictionary
+    :param path: JSON file path.
+    """
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file, ensure_ascii=False, default=str)
+        json_file.flush()
+        os.fsync(json_file.fileno())
+
+    os.replace(f'{path}.tmp', path)
+
+
+def list_chunks(store_dir: str):
+    """List the chunk files of an append-only store, in writing order
+    :param store_dir: store directory
+    :return: sorted list of chunk file paths.
+    """
+    return sorted(glob.glob(os.path.join(store_dir, 'part-*.csv')))
+
+
+def chunk_path(store_dir: str, number: int):
+    """Build a chunk file path
+    :param store_dir: store directory
+    :param number: chunk number
+    :return: chunk file path.
+    """
+    return os.path.join(store_dir, f'part-{number:05d}.csv')
+
+
+def read_header(path: str):
+    """Read the header line of a CSV chunk without loading it
+    :param path: chunk file path
+    :return: list of column names.
+    """
+    with open(path, 'r', encoding='utf8') as chunk_file:
+        return chunk_file.readline().rstrip('\r\n').split(',')
+
+
+def append_rows(store_dir: str, data: pd.DataFrame, max_bytes: int = CHUNK_MAX_BYTES):
+    """Append rows to a store. Only the current chunk is touched, so the write cost does not depend on store size
+    :param store_dir: store directory (created if needed)
+    :param data: rows to append
+    :param max_bytes: size at which a new chunk is started.
+    """
+    if data.empty:
+        return
+
+    with STORE_LOCK:
+        os.makedirs(store_dir, exist_ok=True)
+        chunks = list_chunks(store_dir)
+        number = int(os.path.basename(chunks[-1])[5:10]) if chunks else 0
+
+        if chunks and os.path.getsize(chunks[-1]) < max_bytes and read_header(chunks[-1]) == list(data.columns):
+            data.to_csv(chunks[-1], mode='a', header=False, encoding='utf8', index=False)
+
+        else:  # New chunk: first write, full chunk or schema change
+            data.to_csv(chunk_path(store_dir, number + 1), encoding='utf8', index=False)
+
+
+def iter_rows(store_dir: str, chunksize: int = 10_000, usecols: list = None):
+    """Stream a store as successive DataFrames, with bounded memory
+    :param store_dir: store directory
+    :param chunksize: number of rows per yielded DataFrame
+    :param usecols: columns to read (all columns by default)
+    :return: generator of pd.DataFrame.
+    """
+    for path in list_chunks(store_dir):
+        columns = usecols if usecols is None else [col for col in usecols if col in read_header(path)]
+        yield from pd.read_csv(path, encoding='utf8', chunksize=chunksize, usecols=columns, low_memory=False)
+
+
+def compact_store(store_dir: str, target_bytes: int = COMPACT_TARGET_BYTES):
+    """Merge consecutive small chunks sharing the same columns into bigger ones (streamed, atomic replace)
+    :param store_dir: store directory
+    :param target_bytes: size targeted for merged chunks
+    :return: number of chunks removed by compaction.
+    """
+    chunks = list_chunks(store_dir)[:-1]  # The current chunk is still open for appends
+    groups, group, size = [], [], 0
+
+    for path in chunks:
+        chunk_size = os.path.getsize(path)
+        if group and (size + chunk_size > target_bytes or read_header(path) != read_header(group[0])):
+            groups.append(group)
+            group, size = [], 0
+        group.append(path)
+        size += chunk_size
+    groups.append(group)
+
+    removed = 0
+
+    for group in [group for group in groups if len(group) > 1]:
+        tmp_path = f'{group[0]}.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as tmp_file:
+            for idx, path in enumerate(group):
+                with open(path, 'r', encoding='utf8') as chunk_file:
+                    if idx > 0:
+                        chunk_file.readline()  # Skip repeated header
+                    for line in chunk_file:
+                        tmp_file.write(line)
+
+        os.replace(tmp_path, group[0])  # The merged chunk keeps the number of the oldest one, order is preserved
+        for path in group[1:]:
+            os.remove(path)
+        removed += len(group) - 1
+
+    return removed
+
+
+def import_legacy(store_dir: str, csv_path: str):
+    """Move a legacy single-file history into a store as its first chunk
+    :param store_dir: store directory
+    :param csv_path: legacy CSV file path.
+    """
+    if list_chunks(store_dir) or not os.path.exists(csv_path):
+        return
+
+    os.makedirs(store_dir, exist_ok=True)
+    os.replace(csv_path, chunk_path(store_dir, 0))
+
+
+"MAIN"
+
+if __name__ == '__main__':
+    import_legacy(store_dir='../data/mix_history', csv_path='../data/mix_history.csv')
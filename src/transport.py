@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import email.parser
+import json
+import pyyoutube as pyt
+import random
+import requests
+import threading
+import time
+import tqdm
+import urllib.parse
+import uuid
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+"""File Information
+@file_name: transport.py
+Script containing methods to send requests to YouTube API V3 and youtube.com (shared pooled sessions, multipart batch
+requests, error classification, retries and quota circuit breaker).
+"""
+
+"GLOBAL"
+
+BATCH_URL = 'https://www.googleapis.com/batch/youtube/v3'
+API_PATH = '/youtube/v3/'
+BATCH_SIZE = 50  # Maximum number of calls per batch request
+
+TIMEOUT = (5, 30)  # (connect, read) timeouts in seconds, applied to every request without explicit timeout
+HOST_LIMITS = {'https://www.googleapis.com': 8,  # Maximum simultaneous connections per host (pool size)
+               'https://www.youtube.com': 16}
+RETRIES = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=['GET', 'HEAD'],
+                raise_on_status=False)  # Last response returned once retries are exhausted, errors are then classified
+HEADERS = {'Accept-Encoding': 'gzip', 'User-Agent': 'auto_youtube_playlist (gzip)'}  # Google requires both for gzip
+
+# API error classes (see 'classify'), transient ones are retried with exponential backoff
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+RATE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+BACKEND_REASONS = {'backendError', 'internalError'}
+AUTH_REASONS = {'authError', 'unauthorized', 'forbidden', 'insufficientPermissions'}
+TRANSIENT = {'rateLimitExceeded', 'backendError'}
+LIBRARY_CODES = {code for name, code in vars(pyt.error.ErrorCode).items() if not name.startswith('_')}  # Local errors
+API_RETRIES = 4  # Retries of a transient error (delays: 1, 2, 4, 8 seconds + jitter)
+BACKOFF = 1.0
+
+# Circuit breaker: opened on quota exhaustion, every following API call fails immediately without spending anything
+BREAKER = {'open': False, 'error': None}
+ERRORS = collections.Counter()  # API errors met during the run, by class
+ERRORS_LOCK = threading.Lock()
+
+"CLASSES"
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """HTTP adapter (connection pool) applying default timeouts."""
+
+    def __init__(self, timeout: tuple = TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):  # skipcq: PYL-W0221 - Same signature as HTTPAdapter.send
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+
+"FUNCTIONS"
+
+
+def create_session(host_limits: dict = None, timeout: tuple = TIMEOUT):
+    """Create a requests session with keep-alive connection pools (one per host, blocking when the host limit is
+    reached), gzip negotiation, default timeouts and retries on transient errors
+    :param host_limits: maximum simultaneous connections per host prefix (HOST_LIMITS by default)
+    :param timeout: default (connect, read) timeouts
+    :return session: a requests.Session.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    limits = host_limits or HOST_LIMITS
+    default_size = max(limits.values())
+
+    for prefix in ['https://', 'http://']:  # Any other host
+        session.mount(prefix, TimeoutAdapter(timeout=timeout, pool_maxsize=default_size, max_retries=RETRIES))
+
+    for host, limit in limits.items():
+        session.mount(host, TimeoutAdapter(timeout=timeout, pool_connections=1, pool_maxsize=limit, pool_block=True,
+                                           max_retries=RETRIES))
+
+    return session
+
+
+# API session (holds OAuth token headers) and web session (scrapping / GET-requests on youtube.com) are kept apart so
+# that credentials are never sent to youtube.com.
+API_SESSION = create_session()
+WEB_SESSION = create_session()
+
+
+def attach(service: pyt.Client):
+    """Make a Python YouTube Client send its requests through the shared API session
+    :param service: a Python YouTube Client
+    :return service: the same client.
+    """
+    service.session = API_SESSION
+    service.merge_headers()
+    return service
+
+
+def encode_params(params: dict):
+    """Encode query parameters for a batched call (lists are comma-separated, None values are dropped)
+    :param params: query parameters
+    :return: URL query string.
+    """
+    cleaned = {key: ','.join(value) if isinstance(value, (list, tuple, set)) else value
+               for key, value in params.items() if value is not None}
+    return urllib.parse.urlencode(cleaned)
+
+
+def encode_batch(calls: list, boundary: str):
+    """Build a multipart/mixed batch request body
+    :param calls: list of calls {"method": ..., "path": ..., "params": {...}, "body": {...}}
+    :param boundary: multipart boundary
+    :return: request body as bytes.
+    """
+    parts = []
+
+    for idx, call in enumerate(calls):
+        body = call.get('body')
+        query = encode_params(call.get('params', {}))
+        url = f"{API_PATH}{call['path']}?{query}" if query else f"{API_PATH}{call['path']}"
+        lines = [f'--{boundary}',
+                 'Content-Type: application/http',
+                 f'Content-ID: <item{idx}>',
+                 '',
+                 f"{call.get('method', 'GET')} {url} HTTP/1.1"]
+
+        if body is not None:
+            lines += ['Content-Type: application/json; charset=UTF-8', '', json.dumps(body)]
+
+        else:  # End of headers, no body
+            lines += ['', '']
+
+        parts.append('\r\n'.join(lines) + '\r\n')
+
+    return (''.join(parts) + f'--{boundary}--\r\n').encode('utf-8')
+
+
+def decode_batch(content: bytes, content_type: str, n_calls: int):
+    """Split a multipart/mixed batch response into per-call results
+    :param content: batch response body
+    :param content_type: batch response Content-Type header (with boundary)
+    :param n_calls: number of calls in the batch
+    :return results: list of (status code, JSON data) tuples, in calls order.
+    """
+    message = email.parser.BytesParser().parsebytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + content)
+    results = [(500, {'error': {'code': 500, 'message': 'Missing response in batch.'}})] * n_calls
+
+    for part in message.get_payload():
+        content_id = part['Content-ID'] or ''
+        idx = int(content_id.strip('<>').split('item')[-1])
+        http_response = part.get_payload(decode=True).decode('utf-8')
+        status_line, _, rest = http_response.partition('\r\n')
+        _, _, body = rest.partition('\r\n\r\n')
+        body = body.strip()
+        results[idx] = (int(status_line.split(' ')[1]), json.loads(body) if body else {})
+
+    return results
+
+
+def to_exception(status_code: int, data: dict):
+    """Convert a failed call result to the exception the Python YouTube Client would have raised
+    :param status_code: HTTP status code of the call
+    :param data: JSON data of the call
+    :return: a PyYouTubeException.
+    """
+    error = data.get('error', {})
+    message = error.get('message', str(error)) if isinstance(error, dict) else str(error)
+    exception = pyt.error.PyYouTubeException(pyt.error.ErrorMessage(status_code=status_code, message=message))
+    errors = error.get('errors') if isinstance(error, dict) else None
+    exception.reason = errors[0].get('reason') if errors else None
+    return exception
+
+
+def error_reason(error: Exception):
+    """Get the API error reason (e.g. 'quotaExceeded') of an exception
+    :param error: exception raised by the Python YouTube Client or built by 'to_exception'
+    :return: reason (None if unknown).
+    """
+    if getattr(error, 'reason', None):
+        return error.reason
+
+    response = getattr(error, 'response', None)
+
+    if isinstance(response, requests.Response):
+        try:
+            return response.json()['error']['errors'][0]['reason']
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
+
+    return None
+
+
+def classify(error: Exception):
+    """Classify an API error
+    :param error: exception raised by an API call
+    :return: 'quotaExceeded', 'rateLimitExceeded', 'backendError', 'notFound', 'auth' or 'other'.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return 'backendError'
+
+    reason, status_code = error_reason(error), getattr(error, 'status_code', None)
+
+    if status_code in LIBRARY_CODES:  # Raised by the Python YouTube Client itself (e.g. missing parameter), no retry
+        return 'other'
+    if reason in QUOTA_REASONS:
+        return 'quotaExceeded'
+    if reason in RATE_REASONS or status_code == 429:
+        return 'rateLimitExceeded'
+    if reason in BACKEND_REASONS or 500 <= (status_code or 0) < 600:
+        return 'backendError'
+    if status_code == 404 or (reason or '').endswith('NotFound'):
+        return 'notFound'
+    if reason in AUTH_REASONS or status_code in (401, 403):
+        return 'auth'
+    return 'other'
+
+
+def record_error(error: Exception):
+    """Count an API error by class, and open the circuit breaker on quota exhaustion
+    :param error: exception raised by an API call
+    :return: error class.
+    """
+    error_class = classify(error)
+
+    with ERRORS_LOCK:
+        ERRORS[error_class] += 1
+
+        if error_class == 'quotaExceeded' and not BREAKER['open']:
+            BREAKER.update(open=True, error=error)
+
+    return error_class
+
+
+def backoff_delay(attempt: int, backoff: float = BACKOFF):
+    """Exponential backoff delay with jitter
+    :param attempt: attempt number (0 for the first retry)
+    :param backoff: base delay in seconds
+    :return: delay in seconds.
+    """
+    return backoff * 2 ** attempt + random.uniform(0, backoff)  # skipcq: PTC-W0034 - Not used for security
+
+
+def call_api(func, *args, retries: int = API_RETRIES, **kwargs):
+    """Call the API through a Python YouTube Client method: transient errors (rate limit, backend, including non-JSON
+    responses) are retried with exponential backoff, quota exhaustion opens the circuit breaker, other errors are raised
+    immediately
+    :param func: Python YouTube Client method (e.g. service.playlistItems.list)
+    :param args: positional arguments of the method
+    :param retries: maximum number of retries
+    :param kwargs: keyword arguments of the method
+    :return: method result.
+    """
+    for attempt in range(retries + 1):
+        if BREAKER['open']:
+            raise BREAKER['error']
+
+        try:
+            return func(*args, **kwargs)
+
+        except requests.exceptions.JSONDecodeError as decode_error:  # Not a JSON body (e.g. HTML page of a 5xx error)
+            error = to_exception(502, {'error': {'message': f'Invalid JSON response ({decode_error})',
+                                                 'errors': [{'reason': 'backendError'}]}})
+
+        except (pyt.error.PyYouTubeException, requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as api_error:
+            error = api_error
+
+        if record_error(error) not in TRANSIENT or attempt == retries:
+            raise error
+        time.sleep(backoff_delay(attempt))
+
+    return None  # Not reached
+
+
+def send_batch(service: pyt.Client, calls: list):
+    """Send one multipart batch request
+    :param service: a Python YouTube Client (its session and credentials are used)
+    :param calls: list of calls (50 at most)
+    :return: JSON data for every call, or a PyYouTubeException for failed calls.
+    """
+    boundary = f'batch_{uuid.uuid4().hex}'
+
+    try:
+        response = service.session.post(BATCH_URL, data=encode_batch(calls, boundary),
+                                         headers={'Content-Type': f'multipart/mixed; boundary={boundary}'},
+                                         proxies=service.proxies, timeout=service.timeout)
+
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+        exception = to_exception(503, {'error': {'message': str(error), 'errors': [{'reason': 'backendError'}]}})
+        return [exception] * len(calls)
+
+    if response.status_code != 200:  # The whole batch failed
+        try:
+            error = to_exception(response.status_code, response.json())
+        except ValueError:
+            error = to_exception(response.status_code, {'error': response.text})
+        return [error] * len(calls)
+
+    return [data if status_code < 300 and 'error' not in data else to_exception(status_code, data)
+            for status_code, data in decode_batch(response.content, response.headers['Content-Type'], len(calls))]
+
+
+def batch_execute(service: pyt.Client, calls: list, batch_size: int = BATCH_SIZE, prog_bar: bool = False,
+                  desc: str = None, retries: int = API_RETRIES):
+    """Send API calls grouped in multipart batch requests (one round trip for up to 50 calls). Calls failing with a
+    transient error are sent again with exponential backoff, and no call is sent once the quota circuit breaker is open
+    :param service: a Python YouTube Client (its session and credentials are used)
+    :param calls: list of calls {"method": ..., "path": ..., "params": {...}, "body": {...}}
+    :param batch_size: number of calls per batch request
+    :param prog_bar: to use tqdm progress bar (one step per batch request) or not
+    :param desc: progress bar description
+    :param retries: maximum number of retries of transient errors
+    :return results: JSON data for every call in calls order, or a PyYouTubeException for failed calls.
+    """
+    results = []
+    service.add_token_to_headers()
+    batch_it = range(0, len(calls), batch_size)
+
+    if prog_bar:
+        batch_it = tqdm.tqdm(batch_it, desc=desc)
+
+    for i in batch_it:
+        chunk = calls[i:i + batch_size]
+        chunk_results = [None] * len(chunk)
+        to_send = list(range(len(chunk)))
+
+        for attempt in range(retries + 1):
+            if BREAKER['open']:
+                for idx in to_send:
+                    chunk_results[idx] = BREAKER['error']
+                break
+
+            for idx, result in zip(to_send, send_batch(service, [chunk[idx] for idx in to_send])):
+                chunk_results[idx] = result
+
+            failed = [idx for idx in to_send if isinstance(chunk_results[idx], Exception)]
+            to_send = [idx for idx in failed if record_error(chunk_results[idx]) in TRANSIENT]
+
+            if not to_send or attempt == retries:
+                break
+            time.sleep(backoff_delay(attempt))
+
+        results += chunk_results
+
+    return results
+
+
+def batch_list(service: pyt.Client, resource: str, params_list: list, model):
+    """Batch several 'list' calls on a resource and parse responses as Python YouTube Client models
+    :param service: a Python YouTube Client
+    :param resource: API resource ('videos', 'playlistItems', 'channels', ...)
+    :param params_list: query parameters of each call
+    :param model: response model (e.g. pyt.VideoListResponse)
+    :return: parsed responses (or PyYouTubeException for failed calls), in params_list order.
+    """
+    results = batch_execute(service, [{'method': 'GET', 'path': resource, 'params': params} for params in params_list])
+    return [result if isinstance(result, Exception) else model.from_dict(result) for result in results]
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import os
+
+"""File Information
+@file_name: video_index.py
+Script containing the packed 64-bit encoding of YouTube video IDs and the persistent index of every video ever routed
+(sorted packed IDs behind a Bloom filter, memory-mapped at load).
+"""
+
+"GLOBAL"
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'  # base64url
+DECODE = np.full(256, 255, dtype=np.uint8)
+DECODE[np.frombuffer(ALPHABET.encode('ascii'), dtype=np.uint8)] = np.arange(64, dtype=np.uint8)
+ENCODE = np.frombuffer(ALPHABET.encode('ascii'), dtype=np.uint8)
+
+# A video ID is 11 base64url characters (66 bits); the last character only carries 4 bits (its 2 low bits are zero),
+# so IDs fit exactly in 64 bits.
+SHIFTS = np.array([58 - 6 * i for i in range(10)], dtype=np.uint64)
+
+SEEN_DIR = '../data/seen_index'  # index.npy: [number of IDs, sorted IDs, Bloom filter bytes] as one int64 array
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7  # ~1% false positives with 10 bits per key, confirmed by binary search anyway
+
+"FUNCTIONS"
+
+
+def pack_ids(video_ids):
+    """Pack YouTube video IDs into 64-bit integers (reversible, see 'unpack_ids')
+    :param video_ids: iterable of 11-character video IDs
+    :return: np.ndarray of int64.
+    """
+    video_ids = list(video_ids)
+
+    if not video_ids:
+        return np.empty(0, dtype=np.int64)
+
+    raw = ''.join(video_ids).encode('ascii')
+
+    if len(raw) != 11 * len(video_ids):
+        raise ValueError('Video IDs must have 11 characters.')
+
+    values = DECODE[np.frombuffer(raw, dtype=np.uint8)].reshape(-1, 11)
+
+    if (values == 255).any() or (values[:, 10] & 3).any():
+        raise ValueError('Invalid video ID (not base64url or unexpected last character).')
+
+    values = values.astype(np.uint64)
+    packed = (values[:, :10] << SHIFTS).sum(axis=1, dtype=np.uint64) | (values[:, 10] >> np.uint64(2))
+    return packed.view(np.int64)
+
+
+def unpack_ids(packed):
+    """Unpack 64-bit integers into YouTube video IDs
+    :param packed: array-like of int64 (see 'pack_ids')
+    :return: list of video IDs.
+    """
+    packed = np.asarray(packed, dtype=np.int64).view(np.uint64)
+    values = np.empty((len(packed), 11), dtype=np.uint64)
+    values[:, :10] = (packed[:, None] >> SHIFTS) & np.uint64(63)
+    values[:, 10] = (packed & np.uint64(15)) << np.uint64(2)
+    return ENCODE[values].view('S11').ravel().astype(str).tolist()
+
+
+def bloom_positions(packed: np.ndarray, n_bits: int, n_hashes: int = BLOOM_HASHES):
+    """Bit positions of keys in a Bloom filter (double hashing on a 64-bit mix of the key)
+    :param packed: keys as int64 array
+    :param n_bits: filter size in bits (power of two)
+    :param n_hashes: number of hash functions
+    :return: np.ndarray of shape (len(packed), n_hashes).
+    """
+    with np.errstate(over='ignore'):
+        key = packed.view(np.uint64)
+        h1 = (key ^ (key >> np.uint64(31))) * np.uint64(0x9E3779B97F4A7C15)
+        h1 ^= h1 >> np.uint64(29)
+        h2 = ((h1 * np.uint64(0xBF58476D1CE4E5B9)) ^ (h1 >> np.uint64(32))) | np.uint64(1)
+        steps = np.arange(n_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps * h2[:, None]) & np.uint64(n_bits - 1)
+
+
+"CLASSES"
+
+
+class SeenIndex:
+    """Persistent set of packed video IDs: sorted array (memory-mapped) behind a Bloom filter, plus pending additions
+    kept in memory until 'save'. Both arrays are stored in a single file, so that they are always replaced together."""
+
+    def __init__(self, index_dir: str = SEEN_DIR):
+        self.index_dir = index_dir
+        self.ids = np.empty(0, dtype=np.int64)
+        self.bloom = np.zeros(1, dtype=np.uint8)
+        self.pending = np.empty(0, dtype=np.int64)
+
+        if os.path.exists(f'{index_dir}/index.npy'):
+            index = np.load(f'{index_dir}/index.npy', mmap_mode='r')
+            self.ids, self.bloom = index[1:1 + index[0]], index[1 + index[0]:].view(np.uint8)
+
+        elif os.path.exists(f'{index_dir}/ids.npy'):  # Former layout (two files): the Bloom filter is rebuilt at 'save'
+            self.pending = np.load(f'{index_dir}/ids.npy')
+
+    def __len__(self):
+        return len(self.ids) + len(self.pending)
+
+    def contains(self, packed: np.ndarray):
+        """Check membership of packed video IDs
+        :param packed: keys as int64 array
+        :return: boolean array.
+        """
+        packed = np.asarray(packed, dtype=np.int64)
+        found = np.isin(packed, self.pending)
+
+        if len(self.ids):
+            positions = bloom_positions(packed, len(self.bloom) * 8)
+            bits = (self.bloom[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+            maybe = np.flatnonzero(bits.all(axis=1) & ~found)  # Bloom filter: no false negative
+
+            if len(maybe):  # Confirm with a binary search
+                idx = np.searchsorted(self.ids, packed[maybe])
+                found[maybe] = (idx < len(self.ids)) & (self.ids[np.minimum(idx, len(self.ids) - 1)] == packed[maybe])
+
+        return found
+
+    def add(self, packed: np.ndarray):
+        """Add packed video IDs (kept in memory until 'save')
+        :param packed: keys as int64 array.
+        """
+        self.pending = np.union1d(self.pending, np.asarray(packed, dtype=np.int64))
+
+    def save(self):
+        """Merge pending additions and rebuild the Bloom filter, written atomically."""
+        if not len(self.pending):
+            return
+
+        ids = np.union1d(np.asarray(self.ids), self.pending)
+        n_bits = 1 << max(6, int(np.ceil(np.log2(len(ids) * BLOOM_BITS_PER_KEY))))  # Whole int64 words
+        bloom = np.zeros(n_bits // 8, dtype=np.uint8)
+        positions = bloom_positions(ids, n_bits).ravel()
+        np.bitwise_or.at(bloom, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        with open(f'{self.index_dir}/index.tmp', 'wb') as tmp_file:
+            np.save(tmp_file, np.concatenate([[len(ids)], ids, bloom.view(np.int64)]).astype(np.int64))
+        os.replace(f'{self.index_dir}/index.tmp', f'{self.index_dir}/index.npy')
+
+        for name in ['ids', 'bloom']:  # Former layout
+            if os.path.exists(f'{self.index_dir}/{name}.npy'):
+                os.remove(f'{self.index_dir}/{name}.npy')
+
+        self.ids, self.bloom, self.pending = ids, bloom, np.empty(0, dtype=np.int64)
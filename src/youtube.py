@@ -2,8 +2,9 @@
 
 import ast
 import base64
+import bisect
+import concurrent.futures
 import datetime as dt
-import googleapiclient.errors
 import isodate
 import itertools
 import json
@@ -14,9 +15,13 @@ import pandas as pd
 import pyyoutube as pyt
 import re
 import requests
+import storage
 import sys
+import threading
 import tqdm
+import transport
 import tzlocal
+import video_index
 
 from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
@@ -51,7 +56,80 @@ with open('../data/add-on.json', 'r', encoding='utf8') as add_on_file:
     ADD_ON = json.load(add_on_file)
 
 NOW = dt.datetime.now(tz=tzlocal.get_localzone())
-LAST_EXE = last_exe_date()
+VIDEO_CACHE = storage.load_video_cache()
+
+# Negative cache of dead / empty channels, seeded once with the channels formerly silenced by hand in add-on.json
+# (seeded entries are kept when their channel is alive, so that they are not seeded again)
+NEGATIVE_CACHE = storage.load_json(storage.NEGATIVE_CACHE_PATH)
+
+for pass_id in set(ADD_ON.get('toPass', []) + ADD_ON.get('playlistNotFoundPass', [])) - set(NEGATIVE_CACHE):
+    NEGATIVE_CACHE[pass_id] = {'kind': 'manual', 'strikes': storage.NEGATIVE_MIN_STRIKES,
+                               'until': (NOW + storage.NEGATIVE_TTL).isoformat(), 'seeded': True}
+
+# Checkpoint journal of the current run (see 'start_journal'), only written by the main process
+CHECKPOINT = storage.load_json(storage.CHECKPOINT_PATH)
+JOURNAL = {'active': False, 'lock': threading.Lock()}
+RESUMING = bool(CHECKPOINT) and not CHECKPOINT.get('completed', False)
+
+if RESUMING:  # Interrupted run: same scan window, completed work is not done again
+    LAST_EXE = dt.datetime.fromisoformat(CHECKPOINT['window']['oldest'])
+    WINDOW_END = dt.datetime.fromisoformat(CHECKPOINT['window']['latest'])
+
+elif CHECKPOINT:  # Scan windows follow each other exactly: this one starts where the last completed one ended
+    LAST_EXE, WINDOW_END = dt.datetime.fromisoformat(CHECKPOINT['window']['latest']), NOW
+
+else:  # No journal yet
+    LAST_EXE, WINDOW_END = last_exe_date(), NOW
+
+# Channels and videos left out of this run by transient errors or quota exhaustion: the run is then not completed, so
+# that the next one resumes them (see 'finish_journal')
+SCAN_FAILED = {'channels': set(), 'videos': []}
+
+"CALL PLANS"
+
+# Response fields read by each API consumer. Requested 'part' and 'fields' (partial response) are derived from them, so
+# a field must be declared here before being read (it would be missing from responses otherwise).
+CALL_PLANS = {'playlist_items': ['id', 'snippet.title', 'snippet.videoOwnerChannelId', 'snippet.videoOwnerChannelTitle',
+                                 'contentDetails.videoId', 'contentDetails.videoPublishedAt', 'status.privacyStatus',
+                                 'nextPageToken'],
+              'latest_uploads': ['contentDetails.videoId'],
+              'video_stats': ['id', 'statistics.viewCount', 'statistics.likeCount', 'statistics.commentCount',
+                              'contentDetails.duration', 'snippet.liveBroadcastContent', 'status.privacyStatus'],
+              'video_counters': ['id', 'statistics.viewCount', 'statistics.likeCount', 'statistics.commentCount',
+                                 'status.privacyStatus'],
+              'live_status': ['id', 'snippet.liveBroadcastContent'],
+              'livestreams': ['id', 'snippet.channelId', 'snippet.liveBroadcastContent',
+                              'liveStreamingDetails.concurrentViewers'],
+              'subscribers': ['id', 'statistics.subscriberCount'],
+              'channel_titles': ['id', 'snippet.title'],
+              'item_count': ['id'],
+              're_listening': ['id', 'snippet.publishedAt', 'contentDetails.videoId'],
+              'legacy': ['id', 'contentDetails.videoId'],
+              'insertion': ['id']}
+
+
+def plan_call(consumer: str, listing: bool = True):
+    """Derive the minimal 'part' and 'fields' parameters for an API consumer
+    :param consumer: consumer name (key of CALL_PLANS)
+    :param listing: True for 'list' calls (fields nested in 'items'), False for calls returning a single resource
+    :return: (part list, fields mask) tuple, e.g. (['snippet'], 'items(id,snippet(title))').
+    """
+    item_fields, top_fields = {}, []
+
+    for path in CALL_PLANS[consumer]:
+        if path == 'nextPageToken':  # Response level field
+            top_fields.append(path)
+        else:
+            part, _, sub_field = path.partition('.')
+            item_fields.setdefault(part, [])
+            if sub_field:
+                item_fields[part].append(sub_field)
+
+    parts = [part for part in item_fields if part != 'id']
+    mask = ','.join(f"{part}({','.join(sub_fields)})" if sub_fields else part
+                    for part, sub_fields in item_fields.items())
+    return parts, ','.join([f'items({mask})' if listing else mask] + top_fields)
+
 
 "LOGGERS"
 
@@ -141,7 +219,8 @@ def create_service_local(log: bool = True):
             json.dump(ast.literal_eval(cred.to_json()), cred_file, ensure_ascii=False, indent=4)
 
     try:
-        service = pyt.Client(client_id=cred.client_id, client_secret=cred.client_secret, access_token=cred.token)
+        service = transport.attach(pyt.Client(client_id=cred.client_id, client_secret=cred.client_secret,
+                                              access_token=cred.token))
         if log:
             history.info('YouTube service created successfully.')
 
@@ -190,7 +269,8 @@ def create_service_workflow():
             sys.exit()
 
     try:
-        service = pyt.Client(client_id=creds.client_id, client_secret=creds.client_secret, access_token=creds.token)
+        service = transport.attach(pyt.Client(client_id=creds.client_id, client_secret=creds.client_secret,
+                                              access_token=creds.token))
         history.info('YouTube service created successfully.')
         return service, creds_b64
 
@@ -199,94 +279,130 @@ def create_service_workflow():
         sys.exit()
 
 
-def get_playlist_items(service: pyt.Client, playlist_id: str, day_ago: int = None,
-                       with_last_exe: bool = False, latest_d: dt.datetime = NOW):
-    """Get the videos in a YouTube playlist
+def parse_timestamp(timestamp: str):
+    """Parse an API timestamp (ISO 8601, e.g. '2024-01-31T18:00:00Z') much faster than 'strptime'
+    :param timestamp: ISO 8601 timestamp
+    :return: timezone-aware datetime (None if no timestamp).
+    """
+    if not timestamp:
+        return None
+
+    return dt.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+
+def iter_playlist_items(service: pyt.Client, playlist_id: str, oldest_d: dt.datetime = None,
+                        latest_d: dt.datetime = None, first_page=None):
+    """Lazily yield the videos of a YouTube playlist, page by page. With an oldest date, pagination stops at the first
+    older video (the playlist must be ordered chronologically, like uploads playlists)
     :param service: a Python YouTube Client
     :param playlist_id: a YouTube playlist ID
-    :param day_ago: day difference with a reference date, delimits items' collection field
-    :param latest_d: the latest reference date
-    :param with_last_exe: to use last execution date extracted from log or not
-    :return p_items: playlist items (videos) as a list.
+    :param oldest_d: videos published before this date are not kept (excluded), no limit if None
+    :param latest_d: videos published after this date are not kept (excluded), no limit if None
+    :param first_page: first page already requested (e.g. in a batch request), response or PyYouTubeException
+    :return: generator of playlist items (videos) as dictionaries.
     """
-
-    def filter_items_by_date_range(_p_items: dict, _latest_d: dt.datetime, _oldest_d: dt.datetime = None,
-                                   _day_ago: int = None):
-        """Filter videos by date range
-        :param _p_items: playlist items as dictionary
-        :param _latest_d: the latest reference date
-        :param _oldest_d: latest execution date
-        :param _day_ago: day difference with a reference date, delimits items' collection field
-        :return _p_items: filtered items.
-        """
-        if _oldest_d:
-            return [item for item in _p_items if _oldest_d < item['release_date'] < _latest_d]
-        if _day_ago:
-            date_delta = _latest_d - dt.timedelta(days=_day_ago)
-            return [item for item in _p_items if date_delta < item['release_date'] < _latest_d]
-        return _p_items
-
-    p_items = []
     next_page_token = None
-    date_format = '%Y-%m-%dT%H:%M:%S%z'
 
     while True:
         try:
-            request = service.playlistItems.list(part=['snippet', 'contentDetails', 'status'],
-                                                 playlist_id=playlist_id,
-                                                 max_results=50,
-                                                 pageToken=next_page_token).items  # Request playlist's items
+            if first_page is not None:  # Prefetched page
+                response, first_page = first_page, None
+                if isinstance(response, pyt.error.PyYouTubeException):
+                    raise response
+
+            else:
+                parts, fields = plan_call('playlist_items')
+                response = transport.call_api(service.playlistItems.list,
+                                              part=parts,
+                                              playlist_id=playlist_id,
+                                              max_results=50,
+                                              pageToken=next_page_token,
+                                              fields=fields)  # Request playlist's items
 
-            # Keep necessary data
-            p_items += [{'video_id': item.contentDetails.videoId,
-                         'video_title': item.snippet.title,
-                         'item_id': item.id,
-                         'release_date': dt.datetime.strptime(item.contentDetails.videoPublishedAt, date_format),
-                         'status': item.status.privacyStatus,
-                         'channel_id': item.snippet.videoOwnerChannelId,
-                         'channel_name': item.snippet.videoOwnerChannelTitle} for item in request]
+        except pyt.error.PyYouTubeException as error:
+            error_class = transport.classify(error)
 
-            if with_last_exe:  # In case we want to keep videos published between last exe date and your latest_d
-                oldest_d = LAST_EXE.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
-                latest_d = latest_d.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
-                p_items = filter_items_by_date_range(p_items, latest_d, oldest_d)
+            if error_class == 'notFound':  # Handle channels with no upload yet
+                if not NEGATIVE_CACHE.get(f'UC{playlist_id[2:]}', {}).get('strikes'):  # Warn once, then cache it
+                    history.warning('Playlist not found: %s', playlist_id)
+                return
 
-            elif day_ago is not None:  # In case we want to keep videos published x days ago from your latest_d
-                latest_d = latest_d.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
-                p_items = filter_items_by_date_range(p_items, latest_d, _day_ago=day_ago)
+            # Record an error log otherwise (retries already done), the run goes on with other playlists
+            if error_class != 'quotaExceeded':  # Quota exhaustion is logged once at the end of the run
+                history.error('[%s] %s error: %s', playlist_id, error_class, error.message)
 
-            if len(p_items) <= 50:  # No need for more requests (the playlist must be ordered chronologically!)
-                break
+            if error_class in transport.TRANSIENT or error_class == 'quotaExceeded':  # Not scanned, scanned again
+                SCAN_FAILED['channels'].add(f'UC{playlist_id[2:]}')
+            return
 
-            next_page_token = request.nextPageToken
+        for item in response.items:
+            release_date = parse_timestamp(item.contentDetails.videoPublishedAt)
 
-            if next_page_token is None:
-                break
+            if oldest_d or latest_d:
+                if release_date is None or (latest_d and release_date >= latest_d):  # Private/deleted or too recent
+                    continue
+                if oldest_d and release_date < oldest_d:  # Chronological order: every next item is older
+                    return
 
-        except pyt.error.PyYouTubeException as error:
-            status_code = error.status_code
+            # Keep necessary data
+            yield {'video_id': item.contentDetails.videoId,
+                   'video_title': item.snippet.title,
+                   'item_id': item.id,
+                   'release_date': release_date,
+                   'status': item.status.privacyStatus,
+                   'channel_id': item.snippet.videoOwnerChannelId,
+                   'channel_name': item.snippet.videoOwnerChannelTitle}
 
-            if status_code == 404:  # Handle channels with no upload yet
-                if f'UC{playlist_id[2:]}' not in ADD_ON['playlistNotFoundPass']:  # Ignore if channel well identified
-                    history.warning('Playlist not found: %s', playlist_id)
-                break
+        next_page_token = response.nextPageToken
 
-            # Record a warning log otherwise
-            history.error('[%s] Unknown error: %s', playlist_id, error.message)
-            sys.exit()
+        if next_page_token is None:
+            return
 
-    return p_items
 
+def get_playlist_items(service: pyt.Client, playlist_id: str, day_ago: int = None,
+                       with_last_exe: bool = False, latest_d: dt.datetime = WINDOW_END, first_page=None):
+    """Get the videos in a YouTube playlist
+    :param service: a Python YouTube Client
+    :param playlist_id: a YouTube playlist ID
+    :param day_ago: day difference with a reference date, delimits items' collection field
+    :param latest_d: the latest reference date
+    :param with_last_exe: to use last execution date extracted from log or not
+    :param first_page: first page already requested (see 'iter_playlist_items')
+    :return p_items: playlist items (videos) as a list.
+    """
+    if with_last_exe:  # In case we want to keep videos published between last exe date and your latest_d
+        oldest_d = LAST_EXE.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
+        latest_d = latest_d.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
+
+    elif day_ago is not None:  # In case we want to keep videos published x days ago from your latest_d
+        latest_d = latest_d.replace(minute=0, second=0, microsecond=0)  # Round hour to XX:00:00.0
+        oldest_d = latest_d - dt.timedelta(days=day_ago)
+
+    else:  # Every video of the playlist
+        oldest_d, latest_d = None, None
 
-def get_videos(service: pyt.Client, videos_list: list):
-    """Get information from YouTube videos
+    return list(iter_playlist_items(service, playlist_id, oldest_d=oldest_d, latest_d=latest_d, first_page=first_page))
+
+
+def get_videos_batch(service: pyt.Client, videos_list: list, consumer: str = 'video_stats'):
+    """Get information from YouTube videos, 50 videos per call and up to 50 calls per batch request
     :param service: a Python YouTube Client
     :param videos_list: list of YouTube video IDs
-    :return: request results.
+    :param consumer: consumer name, defines requested properties (see CALL_PLANS)
+    :return: videos information (API models) as a list.
     """
-    return service.videos.list(part=['snippet', 'contentDetails', 'statistics', 'status'],
-                               video_id=videos_list,
-                               max_results=50).items
+    parts, fields = plan_call(consumer)
+
+    # Split task in chunks of size 50 to request on a maximum of 50 videos at each call.
+    params_list = [{'part': parts, 'id': videos_list[i:i + 50], 'maxResults': 50, 'fields': fields}
+                   for i in range(0, len(videos_list), 50)]
+    responses = transport.batch_list(service, 'videos', params_list, pyt.VideoListResponse)
+
+    for response in responses:
+        if isinstance(response, pyt.error.PyYouTubeException):
+            raise response
+
+    return list(itertools.chain.from_iterable(response.items for response in responses))
 
 
 def get_subs(service: pyt.Client, channel_list: list):
@@ -297,13 +413,13 @@ def get_subs(service: pyt.Client, channel_list: list):
     """
     ch_filter = [channel_id for channel_id in channel_list if channel_id is not None]
 
-    # Split task in chunks of size 50 to request on a maximum of 50 channels at each iteration.
-    channels_chunks = [ch_filter[i:i + min(50, len(ch_filter))] for i in range(0, len(ch_filter), 50)]
-    raw_chunk = []
-
-    for chunk in channels_chunks:
-        req = service.channels.list(part=['statistics'], channel_id=chunk, max_results=50).items
-        raw_chunk += req
+    # Split task in chunks of size 50 to request on a maximum of 50 channels at each call (batched).
+    parts, fields = plan_call('subscribers')
+    params_list = [{'part': parts, 'id': ch_filter[i:i + 50], 'maxResults': 50, 'fields': fields}
+                   for i in range(0, len(ch_filter), 50)]
+    responses = transport.batch_list(service, 'channels', params_list, pyt.ChannelListResponse)
+    raw_chunk = list(itertools.chain.from_iterable(response.items for response in responses
+                                                   if not isinstance(response, Exception)))
 
     items = [{'channel_id': item.id, 'subscribers': item.statistics.subscriberCount} for item in raw_chunk]
 
@@ -318,61 +434,136 @@ def check_if_live(service: pyt.Client, videos_list: list):
     """
     items = []
 
-    # Split task in chunks of size 50 to request on a maximum of 50 videos at each iteration.
-    videos_chunks = [videos_list[i:i + min(50, len(videos_list))] for i in range(0, len(videos_list), 50)]
-
-    for chunk in videos_chunks:
-        try:
-            request = get_videos(service=service, videos_list=chunk)
+    try:
+        request = get_videos_batch(service=service, videos_list=list(videos_list), consumer='live_status')
 
-            # Keep necessary data
-            items += [{'video_id': video.id, 'live_status': video.snippet.liveBroadcastContent} for video in request]
+        # Keep necessary data
+        items += [{'video_id': video.id, 'live_status': video.snippet.liveBroadcastContent} for video in request]
 
-        except googleapiclient.errors.HttpError as http_error:
-            history.error(http_error.error_details)
-            sys.exit()
+    except pyt.error.PyYouTubeException as http_error:  # Partial results
+        history.error('Live status request failure (%s): %s', transport.classify(http_error), http_error.message)
 
     return items
 
 
-def get_stats(service: pyt.Client, videos_list: list):
-    """Get duration, views and live status of YouTube video with their ID
+def find_livestreams(service: pyt.Client, channels: list, recent: int = 5, max_workers: int = 8,
+                     prog_bar: bool = True):
+    """Find running livestreams with the API: latest uploads of each channel (concurrent requests), then live status
+    of all these videos with batched 'videos.list' requests (50 videos per request)
+    :param service: a Python YouTube Client
+    :param channels: list of YouTube channel IDs
+    :param recent: number of latest uploads to check per channel (livestreams appear in the uploads playlist)
+    :param max_workers: number of channels requested concurrently
+    :param prog_bar: to use tqdm progress bar or not
+    :return: running livestreams as a list [{"channel_id": ..., "video_id": ..., "viewers": ...}].
+    """
+
+    def latest_uploads(_channel_id: str):
+        """Get the latest video IDs of a YouTube channel
+        :param _channel_id: a YouTube channel ID
+        :return: list of YouTube video IDs.
+        """
+        parts, fields = plan_call('latest_uploads')
+        try:
+            return [item.contentDetails.videoId
+                    for item in transport.call_api(service.playlistItems.list, part=parts,
+                                                   playlist_id=f'UU{_channel_id[2:]}', max_results=recent,
+                                                   fields=fields).items]
+        except pyt.error.PyYouTubeException:  # Channel without upload or deleted
+            return []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        uploads = executor.map(latest_uploads, channels)
+        if prog_bar:
+            uploads = tqdm.tqdm(uploads, total=len(channels), desc='Looking for livestreams')
+        videos_ids = list(itertools.chain.from_iterable(uploads))
+
+    request = get_videos_batch(service=service, videos_list=videos_ids, consumer='livestreams')
+
+    return [{'channel_id': video.snippet.channelId,
+             'video_id': video.id,
+             'viewers': getattr(video.liveStreamingDetails, 'concurrentViewers', None) or 0}
+            for video in request if video.snippet.liveBroadcastContent == 'live']
+
+
+def is_known(video_id: str):
+    """Check if the properties of a video requested once only (duration, shorts, live status) are in the video cache.
+    Upcoming or live streams are not: their live status changes, it is requested again until the stream ends
+    :param video_id: YouTube video ID
+    :return: True if only counters and status need to be requested.
+    """
+    entry = VIDEO_CACHE.get(video_id, {})
+    return all(entry.get(key) is not None for key in ['duration', 'is_shorts']) and entry.get('live_status') == 'none'
+
+
+def get_stats(service: pyt.Client, videos_list: list, snapshot: bool = True):
+    """Get duration, views and live status of YouTube video with their ID. Immutable data (duration, shorts) of known
+    videos comes from the video cache: only their counters are requested, and not at all if recently fetched
     :param service: a Python YouTube Client
     :param videos_list: list of YouTube video IDs
+    :param snapshot: to record retrieved statistics in the snapshots store or not
     :return items: playlist items (videos) as a list.
     """
     items = []
+    now = dt.datetime.now(dt.timezone.utc)
 
     try:
         videos_ids = [video['video_id'] for video in videos_list]
 
     except TypeError:
-        videos_ids = videos_list
-
-    # Split task in chunks of size 50 to request on a maximum of 50 videos at each iteration.
-    videos_chunks = [videos_ids[i:i + min(50, len(videos_ids))] for i in range(0, len(videos_ids), 50)]
+        videos_ids = list(videos_list)
+
+    fresh = [vid_id for vid_id in videos_ids if storage.is_fresh(VIDEO_CACHE.get(vid_id), now)]
+    fresh_ids = set(fresh)
+    known = [vid_id for vid_id in videos_ids if vid_id not in fresh_ids and is_known(vid_id)]
+    unknown = [vid_id for vid_id in videos_ids if vid_id not in fresh_ids and not is_known(vid_id)]
+
+    def fetch(_videos_list: list, _consumer: str):
+        """Request videos, an error leaves their statistics unknown (not deleted) instead of stopping the run
+        :param _videos_list: list of YouTube video IDs
+        :param _consumer: consumer name (see CALL_PLANS)
+        :return: videos information (API models) as a list.
+        """
+        if not _videos_list:
+            return []
 
-    for chunk in videos_chunks:
         try:
-            request = get_videos(service=service, videos_list=chunk)
-
-            # Keep necessary data
-            items += [{'video_id': item.id,
-                       'views': item.statistics.viewCount,
-                       'likes': item.statistics.likeCount,
-                       'comments': item.statistics.commentCount,
-                       'duration': isodate.parse_duration(getattr(item.contentDetails,
-                                                                  'duration', 'PT0S') or 'PT0S').seconds,
-                       'is_shorts': is_shorts(video_id=item.id),
-                       'live_status': item.snippet.liveBroadcastContent,
-                       'latest_status': item.status.privacyStatus} for item in request]
-
-        except googleapiclient.errors.HttpError as http_error:
-            history.error(http_error.error_details)
-            sys.exit()
-
-    validated = [video['video_id'] for video in items]
-    missing = [vid_id for vid_id in videos_list if vid_id not in validated]
+            return get_videos_batch(service=service, videos_list=_videos_list, consumer=_consumer)
+
+        except pyt.error.PyYouTubeException as _http_error:
+            history.error('Statistics request failure for %s video(s) (%s): %s', len(_videos_list),
+                          transport.classify(_http_error), _http_error.message)
+            failed.update(_videos_list)
+            return []
+
+    failed = set()
+
+    # New videos: every property, and shorts probe
+    request = fetch(unknown, 'video_stats')
+    items += [{'video_id': item.id,
+               'views': item.statistics.viewCount,
+               'likes': item.statistics.likeCount,
+               'comments': item.statistics.commentCount,
+               'duration': isodate.parse_duration(getattr(item.contentDetails, 'duration', 'PT0S') or 'PT0S').seconds,
+               'is_shorts': is_shorts(video_id=item.id),
+               'live_status': item.snippet.liveBroadcastContent,
+               'latest_status': item.status.privacyStatus} for item in request]
+
+    # Known videos: counters and status only
+    request = fetch(known, 'video_counters')
+    items += [{'video_id': item.id,
+               'views': item.statistics.viewCount,
+               'likes': item.statistics.likeCount,
+               'comments': item.statistics.commentCount,
+               'duration': VIDEO_CACHE[item.id]['duration'],
+               'is_shorts': VIDEO_CACHE[item.id]['is_shorts'],
+               'live_status': VIDEO_CACHE[item.id]['live_status'],
+               'latest_status': item.status.privacyStatus} for item in request]
+
+    cache_videos(items, fetched_at=now)  # Update cache with fetched data
+
+    validated = {video['video_id'] for video in items}.union(fresh)
+    missing = [vid_id for vid_id in videos_ids if vid_id not in validated and vid_id not in failed]
 
     items += [{'video_id': item_id,
                'views': None,
@@ -383,22 +574,203 @@ def get_stats(service: pyt.Client, videos_list: list):
                'live_status': None,
                'latest_status': 'deleted'} for item_id in missing]
 
+    if snapshot:  # Keep every observation in the long-format snapshots store
+        storage.append_snapshots(items, observed_at=now)
+
+    # Recently fetched videos: everything from cache
+    items += [{'video_id': vid_id, **{key: VIDEO_CACHE[vid_id][key] for key in ['views', 'likes', 'comments',
+                                                                                'duration', 'is_shorts',
+                                                                                'live_status', 'latest_status']}}
+              for vid_id in fresh]
+
     return items
 
 
-def add_stats(service: pyt.Client, video_list: list):
+def start_journal():
+    """Start recording the progress of this run in the checkpoint journal. An interrupted run is resumed: its journal
+    (window, completed channels, enriched videos, confirmed inserts) is kept.
+    """
+    with JOURNAL['lock']:
+        if not RESUMING:
+            CHECKPOINT.clear()
+            CHECKPOINT.update({'window': {'oldest': LAST_EXE.isoformat(), 'latest': WINDOW_END.isoformat()},
+                               'completed': False, 'channels': [], 'found': [], 'enriched': [], 'inserted': {}})
+            storage.save_json(CHECKPOINT, storage.CHECKPOINT_PATH)
+
+        else:
+            history.info('Resuming interrupted run: %s channel(s) scanned, %s video(s) enriched, %s insert(s).',
+                         len(CHECKPOINT['channels']), len(CHECKPOINT['enriched']),
+                         sum(len(videos) for videos in CHECKPOINT['inserted'].values()))
+
+        JOURNAL['active'] = True
+
+
+def limit_window(latest: dt.datetime):
+    """Bring the end of the journaled scan window forward to a date (e.g. end of the window scanned by a shard in
+    another process): the next window starts from there, so that no upload is left unscanned
+    :param latest: scan window end (timezone-aware).
+    """
+    with JOURNAL['lock']:
+        window = CHECKPOINT.setdefault('window', {'oldest': LAST_EXE.isoformat(), 'latest': WINDOW_END.isoformat()})
+
+        if latest < dt.datetime.fromisoformat(window['latest']):
+            window['latest'] = latest.isoformat()
+            if JOURNAL['active']:
+                storage.save_json(CHECKPOINT, storage.CHECKPOINT_PATH)
+
+
+def journal(playlist_id: str = None, **entries):
+    """Record completed units of work in the checkpoint journal, in one atomic write. Nothing is done if journaling
+    is off
+    :param playlist_id: playlist of inserted videos
+    :param entries: values to add by key: 'channels' (channel IDs), 'found' / 'enriched' (videos as dictionaries) or
+    'inserted' (video IDs inserted in playlist_id).
+    """
+    if not JOURNAL['active'] or not any(entries.values()):
+        return
+
+    with JOURNAL['lock']:
+        for key, values in entries.items():
+            if key == 'inserted':
+                CHECKPOINT['inserted'].setdefault(playlist_id, []).extend(values)
+
+            else:
+                CHECKPOINT[key].extend(values)
+
+        storage.save_json(CHECKPOINT, storage.CHECKPOINT_PATH)
+
+
+def journal_rows(key: str):
+    """Get videos recorded in the checkpoint journal, with parsed release dates
+    :param key: 'found' or 'enriched'
+    :return: videos as dictionaries (empty list if journaling is off).
+    """
+    if not JOURNAL['active']:
+        return []
+
+    return [{**video, 'release_date': dt.datetime.fromisoformat(video['release_date'])
+             if video.get('release_date') else None} for video in CHECKPOINT.get(key, [])]
+
+
+def finish_journal():
+    """Mark the run as completed: progress is cleared, the scan window end is kept as next window start."""
+    with JOURNAL['lock']:
+        window = CHECKPOINT.get('window', {'oldest': LAST_EXE.isoformat(), 'latest': WINDOW_END.isoformat()})
+        CHECKPOINT.clear()
+        CHECKPOINT.update({'window': window, 'completed': True})
+        storage.save_json(CHECKPOINT, storage.CHECKPOINT_PATH)
+        JOURNAL['active'] = False
+
+
+def cache_videos(items: list, fetched_at: dt.datetime):
+    """Store fetched statistics and properties of videos in the video cache
+    :param items: videos as dictionaries (formatted by 'get_stats')
+    :param fetched_at: request datetime (timezone-aware).
+    """
+    keys = ['views', 'likes', 'comments', 'duration', 'is_shorts', 'live_status', 'latest_status']
+
+    for item in items:
+        entry = VIDEO_CACHE.setdefault(item['video_id'], {})
+        entry.update({key: item[key] for key in keys if key in item})
+        entry['fetched_at'] = fetched_at.isoformat()
+
+
+def remember_videos(video_list: list):
+    """Store immutable metadata (title, channel, release date) of videos in the video cache
+    :param video_list: videos as dictionaries (formatted by 'iter_channels' or 'add_stats').
+    """
+    for video in video_list:
+        entry = VIDEO_CACHE.setdefault(video['video_id'], {})
+        entry.update({key: video[key] for key in storage.VIDEO_IMMUTABLE if key in video and pd.notna(video[key])})
+        if isinstance(entry.get('release_date'), (dt.datetime, pd.Timestamp)):
+            entry['release_date'] = entry['release_date'].isoformat()
+
+
+def add_stats(service: pyt.Client, video_list: list, chunk_size: int = 2500, snapshot: bool = True):
     """Apply 'get_playlist_items' for a collection of YouTube playlists
     :param service: a Python YouTube Client
     :param video_list: list of videos formatted by iter_channels functions
+    :param chunk_size: number of videos enriched between two checkpoints (2500 = one full batch request)
+    :param snapshot: to record retrieved statistics in the snapshots store or not (see 'get_stats')
     :return: dataframe with every information necessary
     """
-    video_first_data = pd.DataFrame(video_list)
-    additional_data = pd.DataFrame(get_stats(service, video_first_data.video_id.tolist()))
-    return video_first_data.merge(additional_data)
+    stats_keys = ['video_id', 'views', 'likes', 'comments', 'duration', 'is_shorts', 'live_status', 'latest_status']
+    enriched = journal_rows('enriched')  # Enriched before an interruption
+    done = {video['video_id'] for video in enriched}
+    remaining = [video for video in video_list if video['video_id'] not in done]
+
+    for i in range(0, len(remaining), chunk_size):  # One journal entry per chunk
+        video_first_data = pd.DataFrame(remaining[i:i + chunk_size])
+        additional_data = pd.DataFrame(get_stats(service, video_first_data.video_id.tolist(), snapshot=snapshot),
+                                       columns=stats_keys)
+
+        if len(additional_data) < len(video_first_data):  # Request failures (see 'get_stats'), enriched next run
+            failed = set(video_first_data.video_id) - set(additional_data.video_id)
+            SCAN_FAILED['videos'] += [video for video in remaining[i:i + chunk_size] if video['video_id'] in failed]
+            history.warning('%s new video(s) without statistics.', len(failed))
+
+        chunk = json.loads(video_first_data.merge(additional_data).to_json(orient='records', date_format='iso'))
+        remember_videos(chunk)  # Enriched videos only: cached entries always have their statistics
+        journal(enriched=chunk)
+        enriched += chunk
+
+    enriched = pd.DataFrame(enriched)
+
+    if not enriched.empty:
+        enriched['release_date'] = pd.to_datetime(enriched.release_date, utc=True, format='ISO8601')
+
+    return enriched
+
+
+def probe_outcome(first_page):
+    """Outcome of a channel probe (first page of its uploads playlist) for the negative cache
+    :param first_page: response or PyYouTubeException
+    :return: 'notFound', 'empty', 'alive' or None (other error, nothing learned).
+    """
+    if isinstance(first_page, Exception):
+        return 'notFound' if transport.classify(first_page) == 'notFound' else None
+
+    return 'empty' if not first_page.items and first_page.nextPageToken is None else 'alive'
+
+
+def is_skipped(channel_id: str, now: dt.datetime):
+    """Check if a channel is skipped by the negative cache (until its skip duration ends)
+    :param channel_id: YouTube channel ID
+    :param now: reference datetime (timezone-aware)
+    :return: True if the channel should not be requested.
+    """
+    entry = NEGATIVE_CACHE.get(channel_id)
+
+    return entry is not None and entry['until'] is not None and now < dt.datetime.fromisoformat(entry['until'])
+
+
+def record_probe(channel_id: str, outcome: str, now: dt.datetime):
+    """Update the negative cache with a channel probe: alive channels are forgotten (seeded ones are reset), dead or
+    empty ones get one more strike and, from NEGATIVE_MIN_STRIKES strikes, a skip duration doubling at each strike
+    :param channel_id: YouTube channel ID
+    :param outcome: probe outcome (see 'probe_outcome')
+    :param now: reference datetime (timezone-aware).
+    """
+    if outcome is None:
+        return
+
+    if outcome == 'alive':
+        if NEGATIVE_CACHE.get(channel_id, {}).get('seeded'):  # Kept, not to be seeded again from add-on.json
+            NEGATIVE_CACHE[channel_id] = {'kind': 'alive', 'strikes': 0, 'until': None, 'seeded': True}
+        else:
+            NEGATIVE_CACHE.pop(channel_id, None)
+        return
+
+    entry = NEGATIVE_CACHE.setdefault(channel_id, {'kind': outcome, 'strikes': 0, 'until': None})
+    entry.update(kind=outcome, strikes=entry['strikes'] + 1)
+
+    if entry['strikes'] >= storage.NEGATIVE_MIN_STRIKES:
+        ttl = storage.NEGATIVE_TTL * 2 ** (entry['strikes'] - storage.NEGATIVE_MIN_STRIKES)
+        entry['until'] = (now + min(ttl, storage.NEGATIVE_TTL_MAX)).isoformat()
 
 
 def iter_channels(service: pyt.Client, channels: list, day_ago: int = None, with_last_exe: bool = True,
-                  latest_d: dt.datetime = NOW, prog_bar: bool = True):
+                  latest_d: dt.datetime = WINDOW_END, prog_bar: bool = True):
     """Apply 'get_playlist_items' for a collection of YouTube playlists
     :param channels: list of YouTube channel IDs
     :param service: a Python YouTube Client
@@ -408,16 +780,46 @@ def iter_channels(service: pyt.Client, channels: list, day_ago: int = None, with
     :param prog_bar: to use tqdm progress bar or not
     :return: videos retrieved in playlists.
     """
-    playlists = [f'UU{channel_id[2:]}' for channel_id in channels if channel_id not in ADD_ON['toPass']]
-
-    if prog_bar:
+    found = journal_rows('found')  # Videos found before an interruption
+    done = set(CHECKPOINT.get('channels', [])) if JOURNAL['active'] else set()
+    now = dt.datetime.now(dt.timezone.utc)
+    to_scan = [channel_id for channel_id in channels if channel_id not in done]
+    playlists = [f'UU{channel_id[2:]}' for channel_id in to_scan if not is_skipped(channel_id, now)]
+
+    if len(playlists) < len(to_scan):
+        history.info('%s dead or empty channel(s) skipped (negative cache).', len(to_scan) - len(playlists))
+
+    p_bar = tqdm.tqdm(total=len(playlists), desc='Looking for videos to add') if prog_bar else None
+
+    # First page of every playlist in batch requests (one per 50 playlists, then checkpoint), next pages (rarely
+    # needed) are requested one by one
+    parts, fields = plan_call('playlist_items')
+
+    for i in range(0, len(playlists), transport.BATCH_SIZE):
+        chunk = playlists[i:i + transport.BATCH_SIZE]
+        params_list = [{'part': parts, 'playlistId': playlist_id, 'maxResults': 50, 'fields': fields}
+                       for playlist_id in chunk]
+        first_pages = transport.batch_list(service, 'playlistItems', params_list, pyt.PlaylistItemListResponse)
         item_it = [get_playlist_items(service=service, playlist_id=playlist_id, day_ago=day_ago, latest_d=latest_d,
-                                      with_last_exe=with_last_exe)
-                   for playlist_id in tqdm.tqdm(playlists, desc='Looking for videos to add')]
-    else:
-        item_it = [get_playlist_items(service=service, playlist_id=playlist_id, day_ago=day_ago, latest_d=latest_d,
-                                      with_last_exe=with_last_exe) for playlist_id in playlists]
-    return list(itertools.chain.from_iterable(item_it))
+                                      with_last_exe=with_last_exe, first_page=first_page)
+                   for playlist_id, first_page in zip(chunk, first_pages)]
+        items = list(itertools.chain.from_iterable(item_it))
+
+        for playlist_id, first_page in zip(chunk, first_pages):
+            record_probe(f'UC{playlist_id[2:]}', probe_outcome(first_page), now)
+
+        scanned = [f'UC{playlist_id[2:]}' for playlist_id in chunk]
+        journal(found=items, channels=[channel_id for channel_id in scanned
+                                       if channel_id not in SCAN_FAILED['channels']])  # Failed ones are not done
+        found += items
+
+        if p_bar:
+            p_bar.update(len(chunk))
+
+    if p_bar:
+        p_bar.close()
+
+    return list({video['video_id']: video for video in found}.values())  # Failed channels are scanned again if resumed
 
 
 def add_to_playlist(service: pyt.Client, playlist_id: str, videos_list: list, prog_bar: bool = True):
@@ -431,23 +833,31 @@ def add_to_playlist(service: pyt.Client, playlist_id: str, videos_list: list, pr
         api_failure = json.load(api_failure_file)
 
     api_fail = False
+    inserted = set(CHECKPOINT.get('inserted', {}).get(playlist_id, [])) if JOURNAL['active'] else set()
+    videos_list = [video_id for video_id in videos_list if video_id not in inserted]  # Confirmed before interruption
+    _, fields = plan_call('insertion', listing=False)
+    calls = [{'method': 'POST', 'path': 'playlistItems', 'params': {'part': 'snippet', 'fields': fields},
+              'body': {'snippet': {'playlistId': playlist_id,
+                                   'resourceId': {'kind': 'youtube#video', 'videoId': video_id}}}}
+             for video_id in videos_list]
 
-    if prog_bar:
-        add_iterator = tqdm.tqdm(videos_list, desc=f'Adding videos to the playlist ({playlist_id})')
+    # Insertions grouped in batch requests (one round trip per 50 videos), confirmed ones are journaled
+    batch_it = range(0, len(calls), transport.BATCH_SIZE)
 
-    else:
-        add_iterator = videos_list
+    if prog_bar:
+        batch_it = tqdm.tqdm(batch_it, desc=f'Adding videos to the playlist ({playlist_id})')
 
-    for video_id in add_iterator:
-        r_body = {'snippet': {'playlistId': playlist_id, 'resourceId': {'kind': 'youtube#video', 'videoId': video_id}}}
+    for i in batch_it:
+        chunk = videos_list[i:i + transport.BATCH_SIZE]
+        results = transport.batch_execute(service, calls[i:i + transport.BATCH_SIZE])
+        journal(playlist_id, inserted=[video_id for video_id, result in zip(chunk, results)
+                                       if not isinstance(result, pyt.error.PyYouTubeException)])
 
-        try:
-            service.playlistItems.insert(parts='snippet', body=r_body)
-
-        except pyt.error.PyYouTubeException as http_error:  # skipcq: PYL-W0703
-            history.warning('Addition Request Failure: (%s) - %s', video_id, http_error.error_type)
-            api_failure[playlist_id]['failure'].append(video_id)  # Save the video ID in dedicated file
-            api_fail = True
+        for video_id, result in zip(chunk, results):
+            if isinstance(result, pyt.error.PyYouTubeException):
+                history.warning('Addition Request Failure: (%s) - %s', video_id, result.message)
+                api_failure[playlist_id]['failure'].append(video_id)  # Save the video ID in dedicated file
+                api_fail = True
 
     if api_fail:  # Save API failure
         with open('../data/api_failure.json', 'w', encoding='utf-8') as api_failure_file:
@@ -461,18 +871,89 @@ def del_from_playlist(service: pyt.Client, playlist_id: str, items_list: list, p
     :param items_list: list of YouTube playlist items [{"item_id": ..., "video_id": ...}]
     :param prog_bar: to use tqdm progress bar or not.
     """
+    calls = [{'method': 'DELETE', 'path': 'playlistItems', 'params': {'id': item['item_id']}} for item in items_list]
+
+    # Deletions grouped in batch requests (one round trip per 50 items)
+    results = transport.batch_execute(service, calls, prog_bar=prog_bar,
+                                      desc=f'Deleting videos from the playlist ({playlist_id})')
+
+    for item, result in zip(items_list, results):
+        if isinstance(result, pyt.error.PyYouTubeException):
+            history.warning('Deletion Request Failure: (%s) - %s', item['video_id'], result.message)
+
+
+def reorder_moves(current: list, desired: list):
+    """Compute the smallest set of moves turning a playlist order into another one. Items belonging to a longest
+    increasing subsequence (of desired ranks, taken in current order) stay in place, every other item is moved
+    :param current: item keys in current playlist order
+    :param desired: same item keys in desired order
+    :return moves: list of (key, position) tuples to apply in this order, positions account for previous moves.
+    """
+    rank = {key: idx for idx, key in enumerate(desired)}
+    ranks = [rank[key] for key in current]
+
+    # Longest increasing subsequence (patience sorting), keeping predecessors to rebuild it
+    tails, tails_idx, previous = [], [], [None] * len(ranks)
+    for idx, value in enumerate(ranks):
+        pos = bisect.bisect_left(tails, value)
+        previous[idx] = tails_idx[pos - 1] if pos > 0 else None
+        if pos == len(tails):
+            tails.append(value)
+            tails_idx.append(idx)
+        else:
+            tails[pos], tails_idx[pos] = value, idx
+
+    staying, idx = set(), tails_idx[-1] if tails_idx else None
+    while idx is not None:
+        staying.add(current[idx])
+        idx = previous[idx]
+
+    # Insert each moved item right after its desired predecessor, simulating the playlist after every move
+    simulated, moves = list(current), []
+    for idx, key in enumerate(desired):
+        if key in staying:
+            continue
+        simulated.remove(key)
+        position = simulated.index(desired[idx - 1]) + 1 if idx > 0 else 0
+        simulated.insert(position, key)
+        moves.append((key, position))
+
+    return moves
+
+
+def apply_order(service: pyt.Client, playlist_id: str, items_list: list, desired_ids: list, prog_bar: bool = True):
+    """Sort a YouTube playlist with the minimal number of 'playlistItems.update' requests (any sort criteria)
+    :param service: a Python YouTube Client
+    :param playlist_id: a YouTube playlist ID
+    :param items_list: playlist items in current order [{"item_id": ..., "video_id": ...}]
+    :param desired_ids: YouTube video IDs in desired order
+    :param prog_bar: to use tqdm progress bar or not
+    :return: number of moves performed.
+    """
+    item_ids = {item['video_id']: item['item_id'] for item in items_list}
+    desired = [video_id for video_id in dict.fromkeys(desired_ids) if video_id in item_ids]
+    ranked = set(desired)
+    desired += [video_id for video_id in item_ids if video_id not in ranked]  # Unranked items go last
+    moves = reorder_moves(list(item_ids), desired)
+
     if prog_bar:
-        del_iterator = tqdm.tqdm(items_list, desc=f'Deleting videos from the playlist ({playlist_id})')
+        move_iterator = tqdm.tqdm(moves, desc=f'Moving videos in the playlist ({playlist_id})')
 
     else:
-        del_iterator = items_list
+        move_iterator = moves
 
-    for item in del_iterator:
+    for video_id, position in move_iterator:
+        r_body = {'id': item_ids[video_id],
+                  'snippet': {'playlistId': playlist_id,
+                              'resourceId': {'kind': 'youtube#video', 'videoId': video_id},
+                              'position': position}}
         try:
-            service.playlistItems.delete(playlist_item_id=item['item_id'])
+            transport.call_api(service.playlistItems.update, parts='snippet', body=r_body)
 
         except pyt.error.PyYouTubeException as http_error:  # skipcq: PYL-W0703
-            history.warning('Deletion Request Failure: (%s) - %s', item['video_id'], http_error.error_type)
+            history.warning('Update Request Failure: (%s) - %s', video_id, http_error.error_type)
+
+    return len(moves)
 
 
 def sort_db(service: pyt.Client):
@@ -494,14 +975,16 @@ def sort_db(service: pyt.Client):
         for chunk in channels_chunks:
             try:
                 # Request channels
-                request = _service.channels.list(part=['snippet'], channel_id=chunk, max_results=50).items
+                parts, fields = plan_call('channel_titles')
+                request = transport.call_api(_service.channels.list, part=parts, channel_id=chunk, max_results=50,
+                                             fields=fields).items
 
                 # Extract upload playlists, channel names and their ID.
                 information += [{'title': an_item.snippet.title, 'id': an_item.id} for an_item in request]
 
-            except googleapiclient.errors.HttpError as http_error:
-                print(http_error.error_details)
-                sys.exit()
+            except pyt.error.PyYouTubeException as http_error:  # Category left unsorted rather than truncated
+                print(f'{transport.classify(http_error)}: {http_error.message}')
+                return _channel_list
 
         # Sort by channel name alphabetical order
         information = sorted(information, key=lambda dic: dic['title'].lower())
@@ -526,52 +1009,50 @@ def sort_db(service: pyt.Client):
 def is_shorts(video_id: str):
     """Check if a YouTube video is a short or not
     :param video_id: YouTube video ID
-    :return: True if video is short, False otherwise.
+    :return: True if video is short, False otherwise (None if the probe failed, the video is probed again next run).
     """
-    return requests.head(f'https://www.youtube.com/shorts/{video_id}').status_code == 200
+    try:
+        return transport.WEB_SESSION.head(f'https://www.youtube.com/shorts/{video_id}').status_code == 200
+
+    except requests.exceptions.RequestException as error:  # Retries already done, the run goes on
+        history.error('[%s] Shorts probe %s error: %s', video_id, transport.record_error(error), error)
+        return None
 
 
 def weekly_stats(service: pyt.Client, histo_data: pd.DataFrame, week_delta: int,
                  ref_date: dt.datetime = dt.datetime.now(dt.timezone.utc)):
-    """Add weekly statistics to historical data retrieved from YouTube for each run
+    """Request statistics of videos reaching a weekly horizon for each run: they are recorded as snapshots, from which
+    weekly statistics are derived (see 'storage.fill_from_snapshots'), and video status is updated
     :param service: a Python YouTube Client
     :param histo_data: data with statistics retrieved throughout the weeks
     :param week_delta: how far we should get stats for videos (1, 4, 13 or 26 weeks)
     :param ref_date: a reference date (midnight UTC by default)
-    :return histo_data: historical data enhanced with new statistics.
+    :return histo_data: historical data with updated status.
     """
     # Get the date x week ago
     x_week_ago = ref_date.replace(hour=0, minute=0, second=0, microsecond=0) - dt.timedelta(weeks=week_delta)
+    x_week_ago = pd.Timestamp(x_week_ago).tz_convert('UTC')
 
-    # Filter data with this new reference date
-    histo_data['release_date'] = pd.to_datetime(histo_data.release_date)
-    date_mask = (histo_data.release_date.dt.date == x_week_ago.date()) & (histo_data[f'views_w{week_delta}'].isnull())
+    # Filter data with this new reference date ('release_date' is already parsed by storage.read_stats)
+    day_mask = (histo_data.release_date >= x_week_ago) & (histo_data.release_date < x_week_ago + dt.timedelta(days=1))
+    date_mask = day_mask & histo_data[f'views_w{week_delta}'].isna()
     selection = histo_data[date_mask]
-    id_mask = selection.video_id.tolist()
 
     if not selection.empty:  # If some videos are concerned
         vid_id_list = selection.video_id.tolist()  # Get YouTube videos' ID as list
 
-        # Apply get_stats and keep only the three necessary features
+        # Apply get_stats (observations recorded in the snapshots store), keep status only
         to_keep = ['video_id', 'views', 'likes', 'comments', 'latest_status']
-        stats = pd.DataFrame(get_stats(service, vid_id_list))[to_keep]
-        histo_data = histo_data.merge(stats, how='left')  # Merge to previous dataframe
+        stats = pd.DataFrame(get_stats(service, vid_id_list), columns=to_keep).drop_duplicates('video_id')
+        stats.index = video_index.pack_ids(stats.video_id)
+        stats = stats.reindex(selection[storage.STATS_KEY].values)  # Align on selected rows (packed keys)
 
-        # Add values to corresponding week delta and remove redondant columns in dataframe
-        histo_data.loc[histo_data.video_id.isin(id_mask), [f'views_w{week_delta}']] = histo_data.views
-        histo_data.loc[histo_data.video_id.isin(id_mask), [f'likes_w{week_delta}']] = histo_data.likes
-        histo_data.loc[histo_data.video_id.isin(id_mask), [f'comments_w{week_delta}']] = histo_data.comments
-        histo_data.loc[histo_data.video_id.isin(id_mask), ['status']] = histo_data.latest_status
-        histo_data.drop(columns=['views', 'likes', 'comments', 'latest_status'], axis=1, inplace=True)
+        known_status = stats.latest_status.notna().values  # Status is kept for videos whose request failed
+        histo_data.loc[date_mask, 'status'] = stats.latest_status.where(known_status, selection.status.values).values
 
     else:
         history.info('No change to apply on historical data for following delta: %s week(s)', week_delta)
 
-    # Apply the type Int64 for each feature (necessary for export)
-    w_features = [col for col in histo_data.columns if '_w' in col]
-    for feature in w_features:
-        histo_data[[feature]] = histo_data[[feature]].astype('Int64')
-
     return histo_data
 
 
@@ -589,16 +1070,19 @@ def fill_release_radar(service: pyt.Client, target_playlist: str, re_listening_i
 
     # Compute how much videos are necessary to fill the target playlist
     try:
-        n_add = lmt - len(service.playlistItems.list(part=['snippet'],
-                                                     max_results=lmt,
-                                                     playlist_id=target_playlist).items)
+        parts, fields = plan_call('item_count')
+        n_add = lmt - len(transport.call_api(service.playlistItems.list,
+                                             part=parts or ['id'],
+                                             max_results=lmt,
+                                             playlist_id=target_playlist,
+                                             fields=fields).items)
     except pyt.PyYouTubeException as error:
-        if error.status_code == 403:
+        if transport.classify(error) == 'quotaExceeded':
             history.warning('API quota exceeded.')
             n_add = 0
 
         else:
-            history.warning('Unknown error: %s', error.message)
+            history.warning('%s error: %s', transport.classify(error), error.message)
             n_add = 0
 
     if n_add == 0:  # Release Radar has too much content already
@@ -608,15 +1092,25 @@ def fill_release_radar(service: pyt.Client, target_playlist: str, re_listening_i
         n_add_rel, n_add_leg = math.ceil(n_add / 2), math.floor(n_add / 2)  # Initial addition values
 
         # Get videos from both playlists
-        to_re_listen_items = service.playlistItems.list(part=['snippet', 'contentDetails'],
-                                                        playlist_id=re_listening_id,
-                                                        max_results=lmt).items
+        try:
+            parts, fields = plan_call('re_listening')
+            to_re_listen_items = transport.call_api(service.playlistItems.list,
+                                                    part=parts,
+                                                    playlist_id=re_listening_id,
+                                                    max_results=lmt,
+                                                    fields=fields).items
 
-        legacy_items = service.playlistItems.list(part=['contentDetails'], playlist_id=legacy_id, max_results=lmt).items
+            parts, fields = plan_call('legacy')
+            legacy_items = transport.call_api(service.playlistItems.list, part=parts, playlist_id=legacy_id,
+                                              max_results=lmt, fields=fields).items
+
+        except pyt.PyYouTubeException as error:
+            history.warning('Release Radar not filled, %s error: %s', transport.classify(error), error.message)
+            return
 
         # Format list for treatment
         to_re_listen_raw = [{'video_id': item.contentDetails.videoId,
-                             'add_date': dt.datetime.strptime(item.snippet.publishedAt, '%Y-%m-%dT%H:%M:%S%z'),
+                             'add_date': parse_timestamp(item.snippet.publishedAt),
                              'item_id': item.id} for item in to_re_listen_items]
 
         legacy_raw = [{'video_id': item.contentDetails.videoId, 'item_id': item.id} for item in legacy_items]
@@ -645,6 +1139,12 @@ def fill_release_radar(service: pyt.Client, target_playlist: str, re_listening_i
             add_to_playlist(service, target_playlist, [it['video_id'] for it in addition_leg], prog_bar)
             del_from_playlist(service, legacy_id, addition_leg, prog_bar)
 
+        # Log removals in the append-only history store
+        removed = [{'video_id': item['video_id'], 'item_id': item['item_id'], 'source_playlist': p_id,
+                    'removed_at': NOW.isoformat()}
+                   for p_id, items in ((re_listening_id, addition_rel), (legacy_id, addition_leg)) for item in items]
+        storage.append_rows('../data/release_radar_history', pd.DataFrame(removed))
+
 
 def add_api_fail(service: pyt.Client, prog_bar: bool = True):
     """Add missing videos to targeted playlist following API failure on previous run
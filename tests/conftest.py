@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import tempfile
+
+"""File Information
+@file_name: conftest.py
+Scripts in src/ read and write data files relative to their directory ('../data', '../log'): tests run them from a
+temporary workspace with the same layout, so that no real data file is touched.
+"""
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+WORKSPACE = tempfile.mkdtemp(prefix='auto_youtube_playlist_')
+
+for folder in ['data', 'log', 'src']:
+    os.makedirs(os.path.join(WORKSPACE, folder))
+
+with open(os.path.join(WORKSPACE, 'data', 'add-on.json'), 'w', encoding='utf8') as add_on_file:
+    json.dump({}, add_on_file)
+
+with open(os.path.join(WORKSPACE, 'log', 'last_exe.log'), 'w', encoding='utf8') as log_file:
+    log_file.write('2026-01-01 00:00:00+0000 [INFO] - Process started.\n')
+
+os.chdir(os.path.join(WORKSPACE, 'src'))
+sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import types
+
+import pyyoutube as pyt
+import pytest
+
+import storage
+import transport
+import youtube
+
+"""File Information
+@file_name: test_call_plans.py
+Every API consumer must read only the fields declared in youtube.CALL_PLANS: responses are filtered with the requested
+'part' and 'fields' parameters, like the API does, and consumers must give the same result as with full responses.
+"""
+
+"GLOBAL"
+
+VIDEO = {'id': 'vid0000001A',
+         'snippet': {'title': 'Title', 'channelId': 'UC0000000000000000000001', 'liveBroadcastContent': 'live',
+                     'publishedAt': '2026-01-01T00:00:00Z'},
+         'contentDetails': {'duration': 'PT3M10S'},
+         'statistics': {'viewCount': '10', 'likeCount': '2', 'commentCount': '1'},
+         'status': {'privacyStatus': 'public'},
+         'liveStreamingDetails': {'concurrentViewers': '42'}}
+
+PLAYLIST_ITEM = {'id': 'PLI0000001',
+                 'snippet': {'title': 'Title', 'publishedAt': '2026-01-01T00:00:00Z',
+                             'videoOwnerChannelId': 'UC0000000000000000000001', 'videoOwnerChannelTitle': 'Channel'},
+                 'contentDetails': {'videoId': 'vid0000001A', 'videoPublishedAt': '2026-01-01T00:00:00Z'},
+                 'status': {'privacyStatus': 'public'}}
+
+CHANNEL = {'id': 'UC0000000000000000000001', 'snippet': {'title': 'Channel'},
+           'statistics': {'subscriberCount': '100'}}
+
+RESPONSES = {'videos': {'items': [VIDEO]},
+             'playlistItems': {'items': [PLAYLIST_ITEM], 'nextPageToken': None},
+             'channels': {'items': [CHANNEL]}}
+
+MODELS = {'videos': pyt.VideoListResponse, 'playlistItems': pyt.PlaylistItemListResponse,
+          'channels': pyt.ChannelListResponse}
+
+"FUNCTIONS"
+
+
+def parse_mask(mask: str):
+    """Parse a partial response mask, e.g. 'items(id,snippet(title)),nextPageToken'
+    :param mask: 'fields' parameter
+    :return tree: nested dictionary (None for fully kept fields).
+    """
+    tree, stack, name = {}, [], ''
+    current = tree
+
+    for char in mask + ',':
+        if char == '(':
+            current[name] = {}
+            stack.append(current)
+            current, name = current[name], ''
+        elif char in ',)':
+            if name:
+                current[name] = None
+            name = ''
+            if char == ')':
+                current = stack.pop()
+        else:
+            name += char
+
+    return tree
+
+
+def apply_mask(data, tree: dict):
+    """Keep the fields of a mask only, like an API partial response
+    :param data: response data
+    :param tree: parsed mask (see 'parse_mask')
+    :return: filtered data.
+    """
+    if tree is None:
+        return copy.deepcopy(data)
+
+    if isinstance(data, list):
+        return [apply_mask(item, tree) for item in data]
+
+    return {key: apply_mask(data[key], sub_tree) for key, sub_tree in tree.items() if key in data}
+
+
+def respond(resource: str, part, fields: str, masked: bool):
+    """Build the response of a 'list' call
+    :param resource: API resource
+    :param part: requested parts
+    :param fields: requested partial response mask
+    :param masked: to filter the response with the request or not
+    :return: response model.
+    """
+    data = RESPONSES[resource]
+
+    if masked:
+        tree = parse_mask(fields)
+        parts = [part] if isinstance(part, str) else list(part or [])
+        assert set(tree.get('items') or {}) - {'id'} <= set(parts), f'Fields outside requested parts: {fields}'
+        data = apply_mask(data, tree)
+
+    return MODELS[resource].from_dict(data)
+
+
+def fake_service(masked: bool):
+    """Python YouTube Client stand-in answering 'list' calls from RESPONSES
+    :param masked: to filter responses with requests or not
+    :return: service object.
+    """
+    def resource_list(resource: str):
+        return lambda part=None, fields=None, **_: respond(resource, part, fields, masked)
+
+    return types.SimpleNamespace(**{resource: types.SimpleNamespace(list=resource_list(resource))
+                                    for resource in RESPONSES})
+
+
+def run_consumer(monkeypatch, consumer, masked: bool):
+    """Run a consumer with full or filtered responses (batch requests included)
+    :param monkeypatch: pytest fixture
+    :param consumer: function called with the fake service
+    :param masked: to filter responses with requests or not
+    :return: consumer result.
+    """
+    def batch_list(_service, resource, params_list, _model):
+        return [respond(resource, params['part'], params['fields'], masked) for params in params_list]
+
+    monkeypatch.setattr(transport, 'batch_list', batch_list)
+    monkeypatch.setattr(youtube, 'VIDEO_CACHE', {})
+    monkeypatch.setattr(youtube, 'is_shorts', lambda video_id: False)
+    monkeypatch.setattr(storage, 'append_snapshots', lambda items, observed_at: None)
+    return consumer(fake_service(masked))
+
+
+def known_stats(service):
+    """'get_stats' on a video already in the video cache (counters only)
+    :param service: fake service
+    :return: statistics.
+    """
+    youtube.VIDEO_CACHE[VIDEO['id']] = {'duration': 190, 'is_shorts': False, 'live_status': 'none'}
+    return youtube.get_stats(service, [VIDEO['id']])
+
+
+def reads_requested_fields_only(monkeypatch, consumer):
+    """Check that a consumer gives the same result with filtered responses as with full ones
+    :param monkeypatch: pytest fixture
+    :param consumer: function called with the fake service
+    :return: True if no undeclared field is read.
+    """
+    full = run_consumer(monkeypatch, consumer, masked=False)
+    assert full  # Fixtures produce a result for every consumer
+
+    try:
+        return run_consumer(monkeypatch, consumer, masked=True) == full
+    except (AttributeError, TypeError):  # Undeclared part read (None)
+        return False
+
+
+CONSUMERS = {'video_stats': lambda service: youtube.get_stats(service, [VIDEO['id']]),
+             'video_counters': known_stats,
+             'live_status': lambda service: youtube.check_if_live(service, [VIDEO['id']]),
+             'livestreams': lambda service: youtube.find_livestreams(service, [CHANNEL['id']], prog_bar=False),
+             'subscribers': lambda service: youtube.get_subs(service, [CHANNEL['id']]),
+             'playlist_items': lambda service: list(youtube.iter_playlist_items(service, 'UU0000000000000000000001'))}
+
+"TESTS"
+
+
+@pytest.mark.parametrize('name', sorted(CONSUMERS))
+def test_consumer_reads_requested_fields_only(monkeypatch, name):
+    assert reads_requested_fields_only(monkeypatch, CONSUMERS[name])
+
+
+@pytest.mark.parametrize('plan', [['id'], ['id', 'snippet.title']])
+def test_undeclared_field_is_detected(monkeypatch, plan):
+    monkeypatch.setattr(youtube, 'CALL_PLANS', {**youtube.CALL_PLANS, 'live_status': plan})  # No liveBroadcastContent
+    assert not reads_requested_fields_only(monkeypatch, CONSUMERS['live_status'])
+
+
+def test_plan_call_builds_parts_and_mask():
+    parts, fields = youtube.plan_call('live_status')
+    assert parts == ['snippet'] and fields == 'items(id,snippet(liveBroadcastContent))'
+    assert parse_mask(youtube.plan_call('playlist_items')[1])['nextPageToken'] is None
+
+
+def test_cached_video_with_missing_property_is_not_known(monkeypatch, tmp_path):
+    monkeypatch.setattr(youtube, 'VIDEO_CACHE', {})
+    youtube.cache_videos([{'video_id': VIDEO['id'], 'duration': 190, 'is_shorts': None, 'live_status': 'none'},
+                          {'video_id': 'vid0000002A', 'duration': 190, 'is_shorts': False, 'live_status': 'none'}],
+                         fetched_at=youtube.NOW)  # Shorts probe failed for the first video
+    storage.save_video_cache(youtube.VIDEO_CACHE, path=str(tmp_path / 'video_cache.csv'))
+    monkeypatch.setattr(youtube, 'VIDEO_CACHE', storage.load_video_cache(path=str(tmp_path / 'video_cache.csv')))
+
+    assert not youtube.is_known(VIDEO['id']) and youtube.is_known('vid0000002A')
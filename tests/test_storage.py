@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import storage
+import video_index
+
+"""File Information
+@file_name: test_storage.py
+The statistics table keeps its declared schema (compact types) through a write / read cycle, and uses less memory than
+with types inferred by pandas.
+"""
+
+"GLOBAL"
+
+N_ROWS = 100_000
+N_CHANNELS = 500
+
+"FUNCTIONS"
+
+
+@pytest.fixture(scope='module')
+def stats_csv(tmp_path_factory):
+    """Write a synthetic statistics table (missing counters included) following the declared schema
+    :param tmp_path_factory: pytest fixture
+    :return: CSV file path and written table.
+    """
+    rng = np.random.default_rng(0)
+    channels = np.array([f'UC{i:022d}' for i in range(N_CHANNELS)])
+    picked = rng.integers(0, N_CHANNELS, N_ROWS)
+    data = pd.DataFrame({'video_id': video_index.unpack_ids(rng.integers(-2 ** 63, 2 ** 63 - 1, N_ROWS)),
+                         'channel_id': channels[picked],
+                         'release_date': pd.Timestamp('2020-01-01', tz='UTC') +
+                         pd.to_timedelta(rng.integers(0, 4 * 365 * 86400, N_ROWS), unit='s'),
+                         'status': rng.choice(['public', 'private', 'deleted'], N_ROWS),
+                         'is_shorts': rng.random(N_ROWS) < 0.2,
+                         'duration': rng.integers(10, 7200, N_ROWS)})
+
+    for col in [col for col in storage.STATS_COLUMNS if '_w' in col]:
+        data[col] = pd.array(rng.integers(0, 10 ** 6, N_ROWS)).astype('Int64')
+        data.loc[rng.random(N_ROWS) < 0.3, col] = pd.NA  # Horizons not reached yet
+
+    data['channel_name'] = np.char.add('Channel ', picked.astype(str))
+    data['video_title'] = 'Some video title'
+    data = storage.apply_stats_schema(data)
+
+    path = str(tmp_path_factory.mktemp('stats') / 'stats.csv')
+    storage.write_stats(data, path)
+    return path, data
+
+
+"TESTS"
+
+
+def test_schema_round_trips_through_csv(stats_csv):
+    path, data = stats_csv
+    loaded = storage.read_stats(path)
+
+    assert loaded.dtypes.drop([storage.STATS_KEY, 'release_date']).astype(str).to_dict() == \
+        {col: str(dtype) for col, dtype in storage.STATS_SCHEMA.items() if col != 'release_date'}
+    assert str(loaded.release_date.dt.tz) == 'UTC'  # Unit depends on the pandas version
+    expected = data.sort_values(['release_date', 'video_id']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(loaded, expected, check_categorical=False)
+
+
+def test_schema_uses_less_memory_than_inferred_types(stats_csv):
+    path, _ = stats_csv
+    inferred = pd.read_csv(path, encoding='utf-8').memory_usage(deep=True).sum()
+    declared = storage.read_stats(path).memory_usage(deep=True).sum()
+
+    assert declared < 0.6 * inferred
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import http.server
+import threading
+
+import pyyoutube as pyt
+import pytest
+
+import transport
+
+"""File Information
+@file_name: test_transport.py
+Requests go through a local stand-in server: sessions, retries and error classification are tested end to end, without
+reaching Google servers.
+"""
+
+"FUNCTIONS"
+
+
+def stand_in_server(status: int, body: bytes, content_type: str, hits: list):
+    """Start a keep-alive HTTP server answering every request with the same response
+    :param status: HTTP status code
+    :param body: response body
+    :param content_type: response Content-Type header
+    :param hits: list receiving (client address, request headers) of every request
+    :return server: running http.server.ThreadingHTTPServer.
+    """
+    class StandInHandler(http.server.BaseHTTPRequestHandler):
+        """Keep-alive handler recording requests."""
+        protocol_version = 'HTTP/1.1'
+
+        def respond(self, with_body: bool):
+            hits.append((self.client_address, self.headers))
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if with_body:
+                self.wfile.write(body)
+
+        def do_GET(self):  # skipcq: PYL-C0103 - Name imposed by http.server
+            self.respond(with_body=True)
+
+        def do_HEAD(self):  # skipcq: PYL-C0103 - Name imposed by http.server
+            self.respond(with_body=False)
+
+        def log_message(self, *args):  # skipcq: PYL-W0221 - Silence server logs
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Retry immediately (urllib3 retries and 'call_api' retries), start with no recorded error."""
+    monkeypatch.setattr(transport, 'RETRIES', transport.RETRIES.new(backoff_factor=0, respect_retry_after_header=False))
+    monkeypatch.setattr(transport, 'backoff_delay', lambda attempt: 0)
+    monkeypatch.setattr(transport, 'ERRORS', transport.collections.Counter())
+
+
+"TESTS"
+
+
+def test_non_json_server_error_is_retried_and_counted(no_backoff):
+    hits = []
+    server = stand_in_server(503, b'<html><body>Service Unavailable</body></html>', 'text/html', hits)
+    session = transport.create_session(host_limits={f'http://127.0.0.1:{server.server_port}': 2})
+    url = f'http://127.0.0.1:{server.server_port}/youtube/v3/videos'
+
+    with pytest.raises(pyt.error.PyYouTubeException) as error:  # Like the Python YouTube Client does
+        transport.call_api(lambda: pyt.Client.parse_response(session.get(url)), retries=2)
+
+    server.shutdown()
+    assert transport.classify(error.value) == 'backendError'
+    assert transport.ERRORS == {'backendError': 3}
+    assert len(hits) == 3 * (transport.RETRIES.total + 1)  # urllib3 retries for each 'call_api' attempt
+
+
+def test_pooled_session_reuses_connections_and_asks_for_gzip():
+    hits, host_limit = [], 4
+    server = stand_in_server(200, b'', 'text/html', hits)
+    host = f'http://127.0.0.1:{server.server_port}'
+    session = transport.create_session(host_limits={host: host_limit})
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+        statuses = list(executor.map(lambda idx: session.head(f'{host}/shorts/{idx}').status_code, range(200)))
+
+    server.shutdown()
+    assert statuses == [200] * 200 and len(hits) == 200
+    assert len({address for address, _ in hits}) <= host_limit  # One client port per opened connection
+    assert all('gzip' in headers['Accept-Encoding'] for _, headers in hits)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pytest
+
+import video_index
+
+"""File Information
+@file_name: test_video_index.py
+Packed video IDs are a reversible encoding of valid IDs only, and the seen-video index never misses a recorded video,
+whether it is read back from its single file or migrated from the former two-file layout.
+"""
+
+"FUNCTIONS"
+
+
+def random_ids(n_ids: int, seed: int = 0):
+    """Random valid YouTube video IDs (the last character only carries 4 bits)
+    :param n_ids: number of IDs
+    :param seed: random seed
+    :return: list of video IDs.
+    """
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list(video_index.ALPHABET))
+    chars = alphabet[rng.integers(0, 64, (n_ids, 10))]
+    last = alphabet[rng.integers(0, 16, n_ids) * 4]
+    return [''.join(row) + char for row, char in zip(chars, last)]
+
+
+"TESTS"
+
+
+def test_pack_unpack_round_trip():
+    video_ids = random_ids(50_000) + ['dQw4w9WgXcQ', '__________w', 'AAAAAAAAAAA']
+    packed = video_index.pack_ids(video_ids)
+
+    assert packed.dtype == np.int64 and len(np.unique(packed)) == len(set(video_ids))
+    assert video_index.unpack_ids(packed) == video_ids
+    assert len(video_index.pack_ids([])) == 0
+
+
+@pytest.mark.parametrize('video_id', ['dQw4w9WgXc', 'dQw4w9WgXcQQ', 'dQw4w9WgXc!', 'dQw4w9WgXcR', 'dQw4w9WgXcé'])
+def test_invalid_video_id_is_rejected(video_id):
+    with pytest.raises(ValueError):
+        video_index.pack_ids(['dQw4w9WgXcQ', video_id])
+
+
+def test_seen_index_has_no_false_negative(tmp_path):
+    recorded = video_index.pack_ids(random_ids(20_000))
+    others = video_index.pack_ids(random_ids(20_000, seed=1))
+    index = video_index.SeenIndex(str(tmp_path))
+    index.add(recorded)
+    index.save()
+
+    index = video_index.SeenIndex(str(tmp_path))
+    assert isinstance(index.ids, np.memmap) and os.listdir(tmp_path) == ['index.npy']
+    assert index.contains(recorded).all()
+    assert not index.contains(others).any()  # Bloom false positives are discarded by the binary search
+
+    index.add(others[:10])  # Pending additions are found before and after 'save'
+    assert index.contains(others[:10]).all()
+    index.save()
+    assert video_index.SeenIndex(str(tmp_path)).contains(np.concatenate([recorded, others[:10]])).all()
+
+
+def test_seen_index_migrates_former_layout(tmp_path):
+    recorded = np.sort(video_index.pack_ids(random_ids(5_000)))
+    np.save(tmp_path / 'ids.npy', recorded)
+    np.save(tmp_path / 'bloom.npy', np.zeros(8, dtype=np.uint8))  # Stale filter (interrupted two-file write)
+
+    index = video_index.SeenIndex(str(tmp_path))
+    assert len(index) == len(recorded) and index.contains(recorded).all()
+
+    index.save()
+    assert os.listdir(tmp_path) == ['index.npy']
+    assert video_index.SeenIndex(str(tmp_path)).contains(recorded).all()